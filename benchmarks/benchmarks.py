@@ -0,0 +1,128 @@
+"""
+Benchmarks of the hot paths on synthetic fleets of 1x, 10x and 100x the sample data, run with asv
+(see asv.conf.json in the repository root).
+"""
+import os
+
+import pandas as pd
+
+from glas_o_mat import cleaning_coordinates
+from glas_o_mat.dataset import Dataset, ACTIVITIES_FILE, LOCATIONS_FILE
+from glas_o_mat.spatial import add_location_distances
+from glas_o_mat.synthetic import generate_fleet, write_fleet, SAMPLE_LOCATIONS
+
+SCALES = [1, 10, 100]
+
+
+def write_fleets() -> dict[int, str]:
+    paths = {}
+    for scale in SCALES:
+        paths[scale] = os.path.abspath(f'fleet_{scale}')
+        write_fleet(paths[scale], scale)
+    return paths
+
+
+def coordinate_input(scale: int) -> pd.DataFrame:
+    """
+    Builds the input of the coordinate cleaning from a synthetic fleet, one activity per location
+    and day as in the notebooks.
+    """
+    fleet = generate_fleet(SAMPLE_LOCATIONS * scale)
+    activities = fleet[ACTIVITIES_FILE]
+    activities['LOCATION_ID'] = activities['CONTAINER_ID'] // 10_000
+    activities['RECORDED_DATE'] = pd.to_datetime(activities['RECORDED_AT']).dt.normalize()
+
+    activities = add_location_distances(activities, fleet[LOCATIONS_FILE])
+    activities = activities.drop_duplicates(subset=['LOCATION_ID', 'RECORDED_DATE'])
+    return activities[cleaning_coordinates.PIPELINE_COLUMNS].reset_index(drop=True)
+
+
+class Preload:
+    params = SCALES
+    param_names = ['scale']
+    timeout = 600
+    number = 1
+
+    def setup_cache(self):
+        return write_fleets()
+
+    def time_preload(self, paths, scale):
+        Dataset(paths[scale]).preload()
+
+    def time_preload_typed(self, paths, scale):
+        Dataset(paths[scale], typed=True).preload()
+
+    def peakmem_preload(self, paths, scale):
+        Dataset(paths[scale]).preload()
+
+    def peakmem_preload_typed(self, paths, scale):
+        Dataset(paths[scale], typed=True).preload()
+
+
+class Aggregation:
+    params = SCALES
+    param_names = ['scale']
+    timeout = 600
+    number = 1
+
+    def setup_cache(self):
+        return write_fleets()
+
+    def setup(self, paths, scale):
+        self.dataset = Dataset(paths[scale])
+        self.dataset.activities
+        self.dataset.containers
+        self.dataset.construction_types
+
+    def time_aggregated(self, paths, scale):
+        self.dataset.aggregated
+
+
+class CoordinateCleaning:
+    params = SCALES
+    param_names = ['scale']
+    timeout = 600
+
+    def setup_cache(self):
+        stages = {}
+        for scale in SCALES:
+            coordinates = coordinate_input(scale)
+            classified = cleaning_coordinates.outlier_classification_vectorized(coordinates)
+            shifted = cleaning_coordinates.detect_temporary_shifts_vectorized(classified)
+            stages[scale] = (coordinates, classified, shifted)
+        return stages
+
+    def time_outlier_classification(self, stages, scale):
+        cleaning_coordinates.outlier_classification_vectorized(stages[scale][0])
+
+    def time_temporary_shifts(self, stages, scale):
+        cleaning_coordinates.detect_temporary_shifts_vectorized(stages[scale][1])
+
+    def time_update_coordinates(self, stages, scale):
+        cleaning_coordinates.update_coordinates_with_outliers_vectorized(stages[scale][2])
+
+    def time_clean_coordinates(self, stages, scale):
+        cleaning_coordinates.clean_coordinates(stages[scale][0], max_workers=1)
+
+
+class CoordinateCleaningReference:
+    """
+    The per-location apply implementations of the notebooks, only at sample scale.
+    """
+    timeout = 600
+
+    def setup_cache(self):
+        coordinates = coordinate_input(1)
+        classified = cleaning_coordinates.outlier_classification_vectorized(coordinates)
+        shifted = cleaning_coordinates.detect_temporary_shifts_vectorized(classified)
+        return coordinates, classified, shifted
+
+    def time_outlier_classification(self, stages):
+        stages[0].sort_values(['LOCATION_ID', 'RECORDED_DATE']).groupby('LOCATION_ID', group_keys=False) \
+            .apply(cleaning_coordinates.outlier_classification)
+
+    def time_temporary_shifts(self, stages):
+        cleaning_coordinates.detect_temporary_shifts(stages[1].copy())
+
+    def time_update_coordinates(self, stages):
+        cleaning_coordinates.update_coordinates_with_outliers(stages[2].copy())
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+
+def to_days(dates) -> np.ndarray:
+    """
+    Converts dates into days since the epoch.
+    """
+    return pd.to_datetime(dates).to_numpy().astype('datetime64[D]').astype(np.int64)
+
+
+class AsOfIndex:
+    """
+    As-of lookups of periods identified by a group code (e.g. a location) and a start day. The days
+    are offset per group so that one sorted array of keys covers all groups, every batch of lookups
+    is answered by a single binary search. The periods have to be sorted by code and start day.
+    """
+
+    def __init__(self, codes: np.ndarray, starts: np.ndarray):
+        self.__codes = np.asarray(codes, dtype=np.int64)
+        self.__starts = np.asarray(starts, dtype=np.int64)
+
+        self.__origin = self.__starts.min() if self.__starts.size else 0
+        self.__span = int(self.__starts.max() - self.__origin + 1) if self.__starts.size else 1
+        self.__sort_keys = self.__codes * self.__span + (self.__starts - self.__origin)
+
+    def __len__(self) -> int:
+        return self.__sort_keys.size
+
+    def lookup(self, codes, days) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the last period of the group that started on or before the day, for aligned arrays
+        of group codes and days.
+
+        Parameters:
+            codes: Group codes of the lookups, -1 for unknown groups.
+            days: Days of the lookups, see to_days.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The position of the period of every lookup and whether
+                                           one was found. Positions without a period are 0.
+        """
+        codes = np.asarray(codes, dtype=np.int64)
+        days = np.asarray(days, dtype=np.int64)
+        if self.__sort_keys.size == 0:
+            return np.zeros(days.size, dtype=np.int64), np.zeros(days.size, dtype=bool)
+
+        # Clamp the days into the span of the periods, later days still hit the last period
+        offsets = np.clip(days - self.__origin, -1, self.__span - 1)
+        positions = np.searchsorted(self.__sort_keys, codes * self.__span + offsets, side='right') - 1
+        positions = np.maximum(positions, 0)
+
+        found = (codes >= 0) & (self.__codes[positions] == codes) & (days >= self.__starts[positions])
+        return positions, found
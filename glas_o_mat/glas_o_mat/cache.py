@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+# Increase whenever the processing in the Dataset loaders changes, to invalidate existing caches
+CACHE_VERSION = 1
+
+# Chunk size used when hashing source files
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def file_hash(path: str) -> str:
+    """
+    Calculates the SHA-256 hash of a file.
+
+    Parameters:
+        path (str): Path of the file.
+
+    Returns:
+        str: The hexadecimal digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FrameCache:
+    """
+    On-disk cache of processed DataFrames in Parquet format. Every entry is keyed on the size,
+    modification time and hash of the source files it was built from and is rebuilt as soon as
+    one of them changes.
+    """
+
+    def __init__(self, directory: str, version: int = CACHE_VERSION):
+        self.__directory = directory
+        self.__version = version
+
+    @property
+    def directory(self) -> str:
+        return self.__directory
+
+    def read(self, name: str, sources: list[str], key: dict | None = None) -> pd.DataFrame | None:
+        """
+        Reads a cached frame if it is still valid for the given source files.
+
+        Parameters:
+            name (str): Name of the frame.
+            sources (list[str]): Paths of the files the frame was built from.
+            key (dict | None): Additional parameters the frame depends on.
+
+        Returns:
+            pd.DataFrame | None: The cached frame, or None if it is missing or stale.
+        """
+        if not self.is_fresh(name, sources, key):
+            return None
+
+        try:
+            return pd.read_parquet(self.__frame_path(name))
+        except (OSError, ValueError):
+            return None
+
+    def write(self, name: str, sources: list[str], frame: pd.DataFrame, key: dict | None = None):
+        """
+        Stores a frame together with the fingerprint of its source files.
+
+        Parameters:
+            name (str): Name of the frame.
+            sources (list[str]): Paths of the files the frame was built from.
+            frame (pd.DataFrame): The processed frame.
+            key (dict | None): Additional parameters the frame depends on.
+        """
+        os.makedirs(self.__directory, exist_ok=True)
+
+        temporary_path = f'{self.__frame_path(name)}.tmp'
+        frame.to_parquet(temporary_path)
+        os.replace(temporary_path, self.__frame_path(name))
+        self.record(name, sources, key)
+
+    def is_fresh(self, name: str, sources: list[str], key: dict | None = None) -> bool:
+        """
+        Checks whether an entry was built from the current state of its source files.
+
+        Parameters:
+            name (str): Name of the entry.
+            sources (list[str]): Paths of the files the entry was built from.
+            key (dict | None): Additional parameters the entry depends on.
+
+        Returns:
+            bool: True if the entry is still valid.
+        """
+        try:
+            with open(self.__manifest_path(name)) as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
+            return False
+
+        if manifest.get('version') != self.__version or manifest.get('key') != (key or {}):
+            return False
+        if sorted(manifest.get('sources', {})) != sorted(sources):
+            return False
+
+        # Only hash the sources if their size or modification time changed
+        touched = False
+        for source in sources:
+            cached = manifest['sources'][source]
+            try:
+                stat = os.stat(source)
+            except OSError:
+                return False
+            if stat.st_size != cached['size']:
+                return False
+            if stat.st_mtime_ns != cached['mtime_ns']:
+                if file_hash(source) != cached['sha256']:
+                    return False
+                cached['mtime_ns'] = stat.st_mtime_ns
+                touched = True
+
+        if touched:
+            self.__write_manifest(name, manifest)
+        return True
+
+    def record(self, name: str, sources: list[str], key: dict | None = None):
+        """
+        Records the fingerprint of the source files an entry was built from.
+
+        Parameters:
+            name (str): Name of the entry.
+            sources (list[str]): Paths of the files the entry was built from.
+            key (dict | None): Additional parameters the entry depends on.
+        """
+        os.makedirs(self.__directory, exist_ok=True)
+        self.__write_manifest(name, {
+            'version': self.__version,
+            'key': key or {},
+            'sources': {source: self.__fingerprint(source) for source in sources},
+        })
+
+    def invalidate(self, name: str):
+        """
+        Removes a cached frame.
+
+        Parameters:
+            name (str): Name of the frame.
+        """
+        for path in (self.__manifest_path(name), self.__frame_path(name)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def __write_manifest(self, name: str, manifest: dict):
+        temporary_path = f'{self.__manifest_path(name)}.tmp'
+        with open(temporary_path, 'w') as file:
+            json.dump(manifest, file, indent=2)
+        os.replace(temporary_path, self.__manifest_path(name))
+
+    def __frame_path(self, name: str) -> str:
+        return os.path.join(self.__directory, f'{name}.parquet')
+
+    def __manifest_path(self, name: str) -> str:
+        return os.path.join(self.__directory, f'{name}.json')
+
+    @staticmethod
+    def __fingerprint(path: str) -> dict:
+        stat = os.stat(path)
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': file_hash(path)}
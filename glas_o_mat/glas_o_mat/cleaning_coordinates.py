@@ -1,3 +1,10 @@
+from concurrent.futures import ProcessPoolExecutor
+import heapq
+import os
+import time
+
+from glas_o_mat import profiling
+from glas_o_mat.cache import FrameCache
 from glas_o_mat.dataset import Dataset
 import pandas as pd
 import numpy as np
@@ -16,7 +23,20 @@ MIN_SHIFT_THRESHOLD = 35            # Minimum value for min_distance_for_shift
 MIN_POINTS_FOR_SHIFT = 3            # Minimum number of points to qualify as a shift
 ROLLING_WINDOW_SIZE = 3             # Window size for rolling mean/median
 
+# Columns passed to the worker processes of the sharded pipeline
+PIPELINE_COLUMNS = ['LOCATION_ID', 'RECORDED_DATE', 'DISTANCE', 'LATITUDE', 'LONGITUDE', 'GEO_LAT', 'GEO_LON']
+CLASSIFICATIONS = ['accurate', 'temporary_shift', 'outlier']
+
+# Constants the results of the pipeline depend on, a change invalidates all cached results
+PIPELINE_CONSTANTS = [
+    'RELATIVE_DIFF_THRESHOLD', 'HARD_OUTLIER_THRESHOLD', 'OUTLIER_ABSOLUTE_THRESHOLD', 'OUTLIER_MULTIPLIER',
+    'MIN_DISTANCE_FOR_SHIFT', 'SCALING_FACTOR_SPAN', 'SCALING_FACTOR_MIN_DISTANCE', 'MIN_SHIFT_THRESHOLD',
+    'MIN_POINTS_FOR_SHIFT', 'ROLLING_WINDOW_SIZE',
+]
+CLEANING_CACHE_NAME = 'coordinate_cleaning'
+
 
+@profiling.profiled_location('outlier_classification')
 def outlier_classification(group: pd.DataFrame) -> pd.DataFrame:
     """
     Classifies data points in the group based on distance as 'accurate' or 'outlier'.
@@ -77,6 +97,97 @@ def outlier_classification(group: pd.DataFrame) -> pd.DataFrame:
     return group
 
 
+def _segment_ids(location_ids: np.ndarray) -> np.ndarray:
+    """
+    Numbers the runs of equal values in an array sorted by location.
+
+    Parameters:
+        location_ids (np.ndarray): LOCATION_IDs, grouped so that equal values are adjacent.
+
+    Returns:
+        np.ndarray: The segment number of every element, starting at 0.
+    """
+    if location_ids.size == 0:
+        return np.zeros(0, dtype=np.int64)
+    return np.concatenate(([0], np.cumsum(location_ids[1:] != location_ids[:-1])))
+
+
+def _rolling_outliers(distances: np.ndarray, segments: np.ndarray) -> np.ndarray:
+    """
+    Flags outliers based on the centered rolling mean and standard deviation (window of 4)
+    computed separately for every segment.
+
+    Parameters:
+        distances (np.ndarray): Distances of the remaining points, sorted by segment and date.
+        segments (np.ndarray): Segment number of every distance.
+
+    Returns:
+        np.ndarray: Boolean mask of the points exceeding the absolute or statistical thresholds.
+    """
+    rolling_mean = np.full(distances.size, np.nan)
+    rolling_std = np.full(distances.size, np.nan)
+
+    if distances.size >= 4:
+        # A centered window of 4 covers the points i-2 to i+1
+        a, b, c, d = distances[:-3], distances[1:-2], distances[2:-1], distances[3:]
+        mean = ((a + b) + (c + d)) / 4
+        std = np.sqrt(((a - mean) ** 2 + (b - mean) ** 2 + ((c - mean) ** 2 + (d - mean) ** 2)) / 3)
+
+        # Windows reaching into a neighbouring location are incomplete
+        complete = segments[:-3] == segments[3:]
+        rolling_mean[2:-1] = np.where(complete, mean, np.nan)
+        rolling_std[2:-1] = np.where(complete, std, np.nan)
+
+    diff = np.abs(distances - rolling_mean)
+    return (diff > OUTLIER_ABSOLUTE_THRESHOLD) | ((rolling_std > 0) & (diff > OUTLIER_MULTIPLIER * rolling_std))
+
+
+@profiling.profiled('outlier_classification_vectorized')
+def outlier_classification_vectorized(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Classifies the data points of all locations at once. Produces the same 'CLASSIFICATION' and
+    'OUTLIER' columns as applying outlier_classification to every LOCATION_ID group.
+
+    Parameters:
+        df (pd.DataFrame): Input DataFrame with 'LOCATION_ID', 'RECORDED_DATE' and 'DISTANCE'.
+
+    Returns:
+        pd.DataFrame: The DataFrame sorted by 'LOCATION_ID' and 'RECORDED_DATE' with added columns
+                      'CLASSIFICATION' and 'OUTLIER'.
+    """
+    # Sort data by location and recorded date to process all groups in one pass
+    df = df[df['LOCATION_ID'].notna()]
+    df = df.sort_values(['LOCATION_ID', 'RECORDED_DATE'], kind='mergesort')
+
+    distances = df['DISTANCE'].to_numpy(dtype=float)
+    segments = _segment_ids(df['LOCATION_ID'].to_numpy())
+
+    # Step 1: Apply a hard threshold to mark outliers
+    outliers = distances > HARD_OUTLIER_THRESHOLD
+
+    # Step 2: Iteratively remove outliers, re-estimating only locations that changed
+    pending = np.ones(segments[-1] + 1 if segments.size else 0, dtype=bool)
+    while True:
+        remaining = np.flatnonzero(~outliers & pending[segments])
+        new_outliers = remaining[_rolling_outliers(distances[remaining], segments[remaining])]
+
+        # If no new outliers are found, exit the loop
+        if new_outliers.size == 0:
+            break
+
+        outliers[new_outliers] = True
+        pending[:] = False
+        pending[segments[new_outliers]] = True
+
+    # Step 3: Mark all points with DISTANCE < MIN_DISTANCE_FOR_SHIFT as 'accurate'
+    df = df.copy()
+    df['CLASSIFICATION'] = np.where(outliers & ~(distances < MIN_DISTANCE_FOR_SHIFT), 'outlier', 'accurate')
+    df['OUTLIER'] = outliers
+
+    return df
+
+
+@profiling.profiled_location('temporary_shift_detection')
 def temporary_shift_detection(group: pd.DataFrame) -> pd.DataFrame:
     """
     Detects temporary shifts in the given group based on dynamic thresholds and rolling statistics.
@@ -150,6 +261,7 @@ def temporary_shift_detection(group: pd.DataFrame) -> pd.DataFrame:
     return group
 
 
+@profiling.profiled('detect_temporary_shifts')
 def detect_temporary_shifts(df: pd.DataFrame) -> pd.DataFrame:
     """
     Applies temporary shift detection to all groups in the DataFrame.
@@ -169,6 +281,95 @@ def detect_temporary_shifts(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
+def _median_of_three(distances: np.ndarray, segments: np.ndarray) -> np.ndarray:
+    """
+    Calculates the centered rolling median (window of 3) separately for every segment.
+
+    Parameters:
+        distances (np.ndarray): Distances sorted by segment.
+        segments (np.ndarray): Segment number of every distance.
+
+    Returns:
+        np.ndarray: The rolling median, NaN where the window is incomplete.
+    """
+    rolling_median = np.full(distances.size, np.nan)
+
+    if distances.size >= 3:
+        a, b, c = distances[:-2], distances[1:-1], distances[2:]
+        median = np.maximum(np.minimum(a, b), np.minimum(np.maximum(a, b), c))
+        rolling_median[1:-1] = np.where(segments[:-2] == segments[2:], median, np.nan)
+
+    return rolling_median
+
+
+@profiling.profiled('detect_temporary_shifts_vectorized')
+def detect_temporary_shifts_vectorized(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Detects temporary shifts for all locations at once. Produces the same classification as
+    detect_temporary_shifts by run-length encoding the candidate points of every location.
+
+    Parameters:
+        df (pd.DataFrame): Input DataFrame with 'LOCATION_ID', 'CLASSIFICATION' and 'DISTANCE'.
+
+    Returns:
+        pd.DataFrame: Updated DataFrame with temporary shifts classified.
+    """
+    df = df[df['LOCATION_ID'].notna()].copy()
+
+    # Group the rows by location while keeping their order within each location
+    codes, _ = pd.factorize(df['LOCATION_ID'], sort=True)
+    order = np.argsort(codes, kind='stable')
+
+    # Temporarily remove outliers
+    classification = df['CLASSIFICATION'].to_numpy(dtype=object).copy()
+    positions = order[classification[order] != 'outlier']
+    if positions.size == 0:
+        return df
+    distances = df['DISTANCE'].to_numpy(dtype=float)[positions]
+    segments = _segment_ids(codes[positions])
+
+    # Calculate dynamic parameters per location
+    starts = np.flatnonzero(np.r_[True, segments[1:] != segments[:-1]])
+    valid = ~np.isnan(distances)
+    location_range = np.fmax.reduceat(distances, starts) - np.fmin.reduceat(distances, starts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        location_mean = (np.add.reduceat(np.where(valid, distances, 0), starts) /
+                         np.add.reduceat(valid.astype(np.int64), starts))
+
+    # Dynamic shift_span and min_distance_for_shift (NaN falls back to the minimum, like max())
+    shift_span = SCALING_FACTOR_SPAN * location_range
+    shift_span = np.where(shift_span > 10, shift_span, 10)[segments]
+    min_distance_for_shift = SCALING_FACTOR_MIN_DISTANCE * location_mean
+    min_distance_for_shift = np.where(min_distance_for_shift > MIN_SHIFT_THRESHOLD,
+                                      min_distance_for_shift, MIN_SHIFT_THRESHOLD)[segments]
+
+    # Step 1: Calculate rolling median
+    rolling_median = _median_of_three(distances, segments)
+
+    # Step 2: Find runs of points within the dynamic shift span
+    candidate = (distances >= min_distance_for_shift) & (np.abs(distances - rolling_median) <= shift_span)
+    run_starts = np.r_[True, (candidate[1:] != candidate[:-1]) | (segments[1:] != segments[:-1])]
+    run_ids = np.cumsum(run_starts) - 1
+    run_lengths = np.bincount(run_ids)
+    shifted = candidate & (run_lengths[run_ids] >= MIN_POINTS_FOR_SHIFT)
+
+    # Step 3: Check individual points between two shift phases
+    gap = np.zeros_like(shifted)
+    gap[1:-1] = (
+        shifted[:-2] & shifted[2:] & ~shifted[1:-1] &
+        (segments[:-2] == segments[2:]) &
+        (np.abs(distances[:-2] - distances[2:]) <= shift_span[1:-1])
+    )
+    shifted |= gap
+
+    # Step 4: Update the original rows with new classifications
+    classification[positions] = np.where(shifted, 'temporary_shift', 'accurate')
+    df['CLASSIFICATION'] = classification
+
+    return df
+
+
+@profiling.profiled_location('calculate_shifted_coords')
 def calculate_shifted_coords_with_outliers(location_group: pd.DataFrame) -> pd.DataFrame:
     """
     Groups 'temporary_shift' points based on consecutive order after sorting
@@ -232,6 +433,7 @@ def calculate_shifted_coords_with_outliers(location_group: pd.DataFrame) -> pd.D
     return location_group
 
 
+@profiling.profiled('update_coordinates_with_outliers')
 def update_coordinates_with_outliers(df: pd.DataFrame) -> pd.DataFrame:
     """
     Updates coordinates for all location IDs, handling shifts and outliers.
@@ -265,5 +467,377 @@ def update_coordinates_with_outliers(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
+@profiling.profiled('update_coordinates_with_outliers_vectorized')
+def update_coordinates_with_outliers_vectorized(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Updates coordinates for all location IDs at once. Produces the same result as
+    update_coordinates_with_outliers by locating the neighbouring shift phases of every outlier
+    with a binary search over the date-sorted temporary shifts.
+
+    Parameters:
+        df (pd.DataFrame): Input DataFrame with 'LOCATION_ID', 'CLASSIFICATION',
+                           'LATITUDE', 'LONGITUDE', 'RECORDED_DATE', 'GEO_LAT' and 'GEO_LON'.
+
+    Returns:
+        pd.DataFrame: Updated DataFrame with adjusted coordinates.
+    """
+    df = df[df['LOCATION_ID'].notna()].copy()
+    classification = df['CLASSIFICATION'].to_numpy(dtype=object).copy()
+    codes, _ = pd.factorize(df['LOCATION_ID'], sort=True)
+    dates = pd.to_datetime(df['RECORDED_DATE']).to_numpy()
+    geo_lat = df['GEO_LAT'].to_numpy(dtype=float)
+    geo_lon = df['GEO_LON'].to_numpy(dtype=float)
+
+    # Set coordinates for 'accurate' classifications
+    accurate = classification == 'accurate'
+    new_lat = np.where(accurate, geo_lat, np.nan)
+    new_lon = np.where(accurate, geo_lon, np.nan)
+
+    # Sort temporarily shifted points by location and recorded date
+    shifted = np.flatnonzero(classification == 'temporary_shift')
+    shifted = shifted[np.lexsort((dates[shifted], codes[shifted]))]
+
+    # Phases are numbered on the gaps of a freshly reset index in the reference implementation,
+    # which never has any, so every location forms exactly one shift phase
+    phases = _segment_ids(codes[shifted])
+
+    # Calculate mean coordinates for each phase and apply them to the phase
+    phase_lat = pd.Series(df['LATITUDE'].to_numpy(dtype=float)[shifted]).groupby(phases).mean().to_numpy()
+    phase_lon = pd.Series(df['LONGITUDE'].to_numpy(dtype=float)[shifted]).groupby(phases).mean().to_numpy()
+    new_lat[shifted] = phase_lat[phases]
+    new_lon[shifted] = phase_lon[phases]
+
+    # Identify outliers between phases: encode (location, date) as one sortable key
+    outliers = np.flatnonzero((classification == 'outlier') & ~np.isnat(dates))
+    dated = ~np.isnat(dates[shifted])
+    shifted, phases = shifted[dated], phases[dated]
+    unique_dates, ranks = np.unique(np.concatenate((dates[shifted], dates[outliers])), return_inverse=True)
+    ranks = ranks.reshape(-1)
+    shifted_keys = codes[shifted] * (unique_dates.size + 1) + ranks[:shifted.size]
+    outlier_keys = codes[outliers] * (unique_dates.size + 1) + ranks[shifted.size:]
+
+    # Find the last shifted point before and the first one after every outlier
+    before = np.searchsorted(shifted_keys, outlier_keys, side='left') - 1
+    after = np.searchsorted(shifted_keys, outlier_keys, side='right')
+
+    # A sentinel location catches the positions outside the sorted shifts (-1 and the end)
+    shifted_codes = np.append(codes[shifted], -1)
+    bracketed = (shifted_codes[before] == codes[outliers]) & (shifted_codes[after] == codes[outliers])
+
+    # Adjust the outliers to the mean coordinates of the neighbouring phases
+    before_phases = phases[before[bracketed]]
+    after_phases = phases[after[bracketed]]
+    adjusted = outliers[bracketed]
+    new_lat[adjusted] = (phase_lat[before_phases] + phase_lat[after_phases]) / 2
+    new_lon[adjusted] = (phase_lon[before_phases] + phase_lon[after_phases]) / 2
+    classification[adjusted] = 'temporary_shift'
+
+    # Handle remaining outliers with no new coordinates
+    remaining_outliers = (classification == 'outlier') & np.isnan(new_lat) & np.isnan(new_lon)
+    new_lat[remaining_outliers] = geo_lat[remaining_outliers]
+    new_lon[remaining_outliers] = geo_lon[remaining_outliers]
+
+    df['CLASSIFICATION'] = classification
+    df['NEW_LAT'] = new_lat
+    df['NEW_LON'] = new_lon
+
+    return df
+
+
+def _clean_shard(columns: dict) -> dict:
+    """
+    Runs the three cleaning stages on one shard of the activities.
+
+    Parameters:
+        columns (dict): Column arrays of the shard, plus the row positions under 'ROW'.
+
+    Returns:
+        dict: The row positions with the resulting classification codes, outlier flags and
+              new coordinates, and the wall time of every stage under 'SECONDS'.
+    """
+    columns = dict(columns)
+    shard = pd.DataFrame(columns, index=columns.pop('ROW'))
+
+    # The stages are timed here, a worker process has no profiler of its own
+    seconds = {}
+    for name, function in SHARD_STAGES:
+        start = time.perf_counter()
+        shard = function(shard)
+        seconds[name] = time.perf_counter() - start
+
+    return {
+        'SECONDS': seconds,
+        'ROW': shard.index.to_numpy(),
+        'CLASSIFICATION': pd.Categorical(shard['CLASSIFICATION'], categories=CLASSIFICATIONS).codes,
+        'OUTLIER': shard['OUTLIER'].to_numpy(),
+        'NEW_LAT': shard['NEW_LAT'].to_numpy(),
+        'NEW_LON': shard['NEW_LON'].to_numpy(),
+    }
+
+
+# Stages run on every shard of clean_coordinates, by the names they are profiled under
+SHARD_STAGES = [
+    ('outlier_classification_vectorized', outlier_classification_vectorized),
+    ('detect_temporary_shifts_vectorized', detect_temporary_shifts_vectorized),
+    ('update_coordinates_with_outliers_vectorized', update_coordinates_with_outliers_vectorized),
+]
+
+
+def _assign_shards(sizes: np.ndarray, shards: int) -> np.ndarray:
+    """
+    Distributes groups over shards, largest group first onto the least loaded shard.
+
+    Parameters:
+        sizes (np.ndarray): Number of rows of every group.
+        shards (int): Number of shards.
+
+    Returns:
+        np.ndarray: The shard number of every group.
+    """
+    assignment = np.zeros(sizes.size, dtype=np.int64)
+    loads = [(0, shard) for shard in range(shards)]
+    for group in np.argsort(-sizes, kind='stable'):
+        load, shard = heapq.heappop(loads)
+        assignment[group] = shard
+        heapq.heappush(loads, (load + int(sizes[group]), shard))
+    return assignment
 
 
+def _profile_shards(payloads: list[dict], results: list[dict], in_process: bool):
+    """
+    Adds the stage times of the shards to the active profiler. The time of a stage on a shard is
+    split over its locations by their number of rows. Stages that ran in a worker process are
+    added as stages as well, in process they were recorded by their own decorators.
+    """
+    profiler = profiling.active()
+    if profiler is None:
+        return
+
+    for payload, result in zip(payloads, results):
+        location_ids, rows = np.unique(payload['LOCATION_ID'], return_counts=True)
+        for name, seconds in result['SECONDS'].items():
+            if not in_process:
+                profiler.add_stage_time(name, seconds, rows.sum(), rows.sum())
+            profiler.add_location_times(name, location_ids.tolist(), (seconds * rows / rows.sum()).tolist())
+
+
+@profiling.profiled('clean_coordinates')
+def clean_coordinates(df: pd.DataFrame, max_workers: int | None = None, shard_by: str = 'LOCATION_ID',
+                      locations: pd.DataFrame | None = None) -> pd.DataFrame:
+    """
+    Runs outlier classification, temporary shift detection and the coordinate update on shards of
+    the activities in a process pool. Every location is processed within a single shard.
+
+    Parameters:
+        df (pd.DataFrame): Input DataFrame with 'LOCATION_ID', 'RECORDED_DATE', 'DISTANCE',
+                           'LATITUDE', 'LONGITUDE', 'GEO_LAT' and 'GEO_LON'.
+        max_workers (int | None): Number of worker processes, defaults to the number of CPUs.
+        shard_by (str): 'LOCATION_ID' or 'DISPOSITION_AREA_ID'.
+        locations (pd.DataFrame | None): Locations with 'DISPOSITION_AREA_ID', required when
+                                         sharding by disposition area.
+
+    Returns:
+        pd.DataFrame: The DataFrame in its original order with added columns 'CLASSIFICATION',
+                      'OUTLIER', 'NEW_LAT' and 'NEW_LON'.
+    """
+    df = df[df['LOCATION_ID'].notna()]
+    max_workers = max_workers or os.cpu_count() or 1
+
+    # Determine the shard key of every row
+    if shard_by == 'LOCATION_ID':
+        keys = df['LOCATION_ID']
+    elif shard_by == 'DISPOSITION_AREA_ID':
+        if locations is None:
+            raise ValueError('Sharding by DISPOSITION_AREA_ID requires the locations')
+        areas = locations.drop_duplicates('LOCATION_ID').set_index('LOCATION_ID')['DISPOSITION_AREA_ID']
+        keys = df['LOCATION_ID'].map(areas)
+    else:
+        raise ValueError(f'Cannot shard by {shard_by}')
+    codes, _ = pd.factorize(keys, sort=True, use_na_sentinel=False)
+
+    # Balance the shards by their number of rows
+    shard_of_row = _assign_shards(np.bincount(codes), max_workers)[codes]
+    order = np.argsort(shard_of_row, kind='stable')
+    bounds = np.cumsum(np.bincount(shard_of_row, minlength=max_workers))[:-1]
+
+    # Pass compact column arrays instead of pickling the DataFrame
+    columns = {column: df[column].to_numpy() for column in PIPELINE_COLUMNS}
+    columns['RECORDED_DATE'] = pd.to_datetime(df['RECORDED_DATE']).to_numpy()
+    payloads = [
+        {'ROW': rows, **{column: values[rows] for column, values in columns.items()}}
+        for rows in np.split(order, bounds) if rows.size
+    ]
+
+    in_process = max_workers == 1 or len(payloads) <= 1
+    if in_process:
+        results = [_clean_shard(payload) for payload in payloads]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_clean_shard, payloads))
+    _profile_shards(payloads, results, in_process)
+
+    # Reassemble the results in the original order
+    classification = np.zeros(len(df), dtype=np.int8)
+    outlier = np.zeros(len(df), dtype=bool)
+    new_lat = np.full(len(df), np.nan)
+    new_lon = np.full(len(df), np.nan)
+    for result in results:
+        classification[result['ROW']] = result['CLASSIFICATION']
+        outlier[result['ROW']] = result['OUTLIER']
+        new_lat[result['ROW']] = result['NEW_LAT']
+        new_lon[result['ROW']] = result['NEW_LON']
+
+    df = df.copy()
+    df['CLASSIFICATION'] = np.asarray(CLASSIFICATIONS, dtype=object)[classification]
+    df['OUTLIER'] = outlier
+    df['NEW_LAT'] = new_lat
+    df['NEW_LON'] = new_lon
+
+    return df
+
+
+def _location_hashes(df: pd.DataFrame) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Hashes the input rows of every location, depending on their order within the location.
+
+    Parameters:
+        df (pd.DataFrame): Input DataFrame with the PIPELINE_COLUMNS.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: The row positions sorted by
+            location, the LOCATION_IDs, the number of rows and the hash of every location.
+    """
+    frame = df[PIPELINE_COLUMNS].assign(RECORDED_DATE=pd.to_datetime(df['RECORDED_DATE']))
+    row_hashes = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+    order = np.argsort(df['LOCATION_ID'].to_numpy(), kind='stable')
+    location_ids = df['LOCATION_ID'].to_numpy()[order]
+    starts = np.flatnonzero(np.r_[True, location_ids[1:] != location_ids[:-1]]) if order.size else order
+    sizes = np.diff(np.append(starts, order.size))
+
+    # Mixing in the position within the location makes the sum depend on the order of the rows
+    positions = (np.arange(order.size) - np.repeat(starts, sizes)).astype(np.uint64)
+    mixed = pd.util.hash_array(row_hashes[order] ^ (positions * np.uint64(0x9E3779B97F4A7C15)))
+    hashes = np.add.reduceat(mixed, starts) if order.size else mixed
+    return order, location_ids[starts], sizes, hashes
+
+
+def clean_coordinates_cached(df: pd.DataFrame, cache_dir: str, max_workers: int | None = None,
+                             shard_by: str = 'LOCATION_ID', locations: pd.DataFrame | None = None) -> pd.DataFrame:
+    """
+    Runs clean_coordinates only for the locations whose input rows changed since the last run.
+    The results are cached per LOCATION_ID on a hash of the location's input rows, the cache is
+    discarded as a whole when one of the PIPELINE_CONSTANTS changes.
+
+    Parameters:
+        df (pd.DataFrame): Input DataFrame, see clean_coordinates.
+        cache_dir (str): Directory of the cache.
+        max_workers, shard_by, locations: See clean_coordinates.
+
+    Returns:
+        pd.DataFrame: The same as clean_coordinates.
+    """
+    df = df[df['LOCATION_ID'].notna()]
+    cache = FrameCache(cache_dir)
+    key = {'constants': {name: globals()[name] for name in PIPELINE_CONSTANTS}}
+    order, location_ids, sizes, hashes = _location_hashes(df)
+
+    # The cache holds one row per input row, sorted by location and position within the location
+    cached = cache.read(CLEANING_CACHE_NAME, [], key)
+    if cached is None:
+        cached = pd.DataFrame({'LOCATION_ID': location_ids[:0], 'INPUT_HASH': hashes[:0],
+                               'CLASSIFICATION': np.zeros(0, dtype=np.int8), 'OUTLIER': np.zeros(0, dtype=bool),
+                               'NEW_LAT': np.zeros(0), 'NEW_LON': np.zeros(0)})
+    cached_ids, cached_starts, cached_sizes = np.unique(cached['LOCATION_ID'].to_numpy(), return_index=True,
+                                                        return_counts=True)
+
+    # A location is reused as a whole if its hash and number of rows are unchanged
+    matches = pd.Index(cached_ids).get_indexer(location_ids)
+    found = matches >= 0
+    found[found] = (cached['INPUT_HASH'].to_numpy()[cached_starts[matches[found]]] == hashes[found]) & \
+                   (cached_sizes[matches[found]] == sizes[found])
+    row_found = np.repeat(found, sizes)
+
+    # Positions of the reused rows in the cache, unmatched locations (-1) get the appended 0
+    row_starts = np.repeat(np.append(0, np.cumsum(sizes)[:-1]), sizes)
+    sources = np.repeat(np.append(cached_starts, 0)[matches], sizes) + np.arange(order.size) - row_starts
+    hit_rows, sources = order[row_found], sources[row_found]
+    dirty_rows = np.sort(order[~row_found])
+
+    classification = np.zeros(len(df), dtype=np.int8)
+    outlier = np.zeros(len(df), dtype=bool)
+    new_lat = np.full(len(df), np.nan)
+    new_lon = np.full(len(df), np.nan)
+    classification[hit_rows] = cached['CLASSIFICATION'].to_numpy()[sources]
+    outlier[hit_rows] = cached['OUTLIER'].to_numpy()[sources]
+    new_lat[hit_rows] = cached['NEW_LAT'].to_numpy()[sources]
+    new_lon[hit_rows] = cached['NEW_LON'].to_numpy()[sources]
+
+    with profiling.stage('clean_coordinates_cached', len(df)) as record:
+        record.rows_out = dirty_rows.size
+        if dirty_rows.size:
+            computed = clean_coordinates(df.iloc[dirty_rows], max_workers, shard_by, locations)
+            classification[dirty_rows] = pd.Categorical(computed['CLASSIFICATION'], categories=CLASSIFICATIONS).codes
+            outlier[dirty_rows] = computed['OUTLIER'].to_numpy()
+            new_lat[dirty_rows] = computed['NEW_LAT'].to_numpy()
+            new_lon[dirty_rows] = computed['NEW_LON'].to_numpy()
+
+    # Replace the recomputed locations in the cache, locations missing in the input are kept
+    if dirty_rows.size:
+        dirty_order = order[~row_found]
+        fresh = pd.DataFrame({
+            'LOCATION_ID': location_ids[~found].repeat(sizes[~found]),
+            'INPUT_HASH': hashes[~found].repeat(sizes[~found]),
+            'CLASSIFICATION': classification[dirty_order],
+            'OUTLIER': outlier[dirty_order],
+            'NEW_LAT': new_lat[dirty_order],
+            'NEW_LON': new_lon[dirty_order],
+        })
+        kept = cached[~cached['LOCATION_ID'].isin(fresh['LOCATION_ID'])]
+        updated = pd.concat([kept, fresh], ignore_index=True).sort_values('LOCATION_ID', kind='mergesort')
+        cache.write(CLEANING_CACHE_NAME, [], updated.reset_index(drop=True), key)
+
+    df = df.copy()
+    df['CLASSIFICATION'] = np.asarray(CLASSIFICATIONS, dtype=object)[classification]
+    df['OUTLIER'] = outlier
+    df['NEW_LAT'] = new_lat
+    df['NEW_LON'] = new_lon
+
+    return df
+
+
+def versioned_coordinates(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Builds the time-versioned location coordinates (Locations_cleaned.csv) from the output of
+    update_coordinates_with_outliers or clean_coordinates. A new period starts whenever the
+    cleaned coordinates of a location change, rows without cleaned coordinates are skipped.
+
+    Parameters:
+        df (pd.DataFrame): Input DataFrame with 'LOCATION_ID', 'RECORDED_DATE', 'NEW_LAT' and
+                           'NEW_LON'.
+
+    Returns:
+        pd.DataFrame: The periods with 'LOCATION_ID', 'START_DATUM', 'END_DATUM' (first and
+                      last day with these coordinates), 'LAT' and 'LONG'.
+    """
+    df = df[df['LOCATION_ID'].notna() & df['NEW_LAT'].notna() & df['NEW_LON'].notna()]
+    df = df.assign(RECORDED_DATE=pd.to_datetime(df['RECORDED_DATE']).dt.normalize())
+    df = df.sort_values(['LOCATION_ID', 'RECORDED_DATE'], kind='mergesort')
+
+    location_ids = df['LOCATION_ID'].to_numpy()
+    lat = df['NEW_LAT'].to_numpy(dtype=float)
+    lon = df['NEW_LON'].to_numpy(dtype=float)
+    dates = df['RECORDED_DATE'].to_numpy()
+
+    changed = np.ones(len(df), dtype=bool)
+    changed[1:] = (location_ids[1:] != location_ids[:-1]) | (lat[1:] != lat[:-1]) | (lon[1:] != lon[:-1])
+    starts = np.flatnonzero(changed)
+    ends = np.append(starts, len(df))[1:] - 1
+
+    return pd.DataFrame({
+        'LOCATION_ID': location_ids[starts].astype(np.int64),
+        'START_DATUM': dates[starts],
+        'END_DATUM': dates[ends],
+        'LAT': lat[starts],
+        'LONG': lon[starts],
+    })
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+from glas_o_mat.asof import AsOfIndex, to_days
+
+HISTORY_KEYS = ['LOCATION_ID', 'MATERIAL_TYPE_ID']
+
+
+def container_count_history(activities: pd.DataFrame,
+                            active_since: pd.Timestamp | None = None) -> pd.DataFrame:
+    """
+    Builds the number of containers per location and material over time with a single sweep over
+    add/remove events. A container is counted from the day of its first activity to the day of its
+    last activity.
+
+    Parameters:
+        activities (pd.DataFrame): Activities with 'LOCATION_ID', 'MATERIAL_ID', 'CONTAINER_ID'
+                                   and 'DATE', e.g. Dataset.activities.
+        active_since (pd.Timestamp | None): Containers with an activity on or after this date are
+                                            still in place, their count stays open-ended.
+
+    Returns:
+        pd.DataFrame: Intervals in the style of ContainerCountHistory.csv with 'LOCATION_ID',
+                      'MATERIAL_TYPE_ID', 'START_DATE', 'END_DATE' (inclusive, NaT if open-ended)
+                      and 'NUM_CONTAINERS'. Days not covered by an interval have no containers.
+    """
+    # First and last day of every container
+    spans = pd.DataFrame({
+        'LOCATION_ID': activities['LOCATION_ID'].to_numpy(),
+        'MATERIAL_TYPE_ID': activities['MATERIAL_ID'].to_numpy(),
+        'CONTAINER_ID': activities['CONTAINER_ID'].to_numpy(),
+        'DATE': pd.to_datetime(activities['DATE']).to_numpy(),
+    })
+    spans = spans.groupby(['CONTAINER_ID', *HISTORY_KEYS])['DATE'].agg(['min', 'max']).reset_index()
+
+    # A container is added on its first day and removed the day after its last one
+    removed = spans if active_since is None else spans[spans['max'] < pd.Timestamp(active_since)]
+    events = pd.concat([
+        pd.DataFrame({**{key: spans[key] for key in HISTORY_KEYS}, 'DATE': spans['min'], 'CHANGE': 1}),
+        pd.DataFrame({**{key: removed[key] for key in HISTORY_KEYS},
+                      'DATE': removed['max'] + pd.Timedelta(days=1), 'CHANGE': -1}),
+    ], ignore_index=True)
+
+    # Sweep the events in order, days without a net change do not start a new interval
+    events = events.groupby([*HISTORY_KEYS, 'DATE'], sort=True)['CHANGE'].sum().reset_index()
+    events = events[events['CHANGE'] != 0].copy()
+    events['NUM_CONTAINERS'] = events.groupby(HISTORY_KEYS)['CHANGE'].cumsum()
+
+    # Every interval ends the day before the next change of its location and material
+    events['END_DATE'] = events.groupby(HISTORY_KEYS)['DATE'].shift(-1) - pd.Timedelta(days=1)
+    history = events[events['NUM_CONTAINERS'] > 0].rename(columns={'DATE': 'START_DATE'})
+
+    return history[[*HISTORY_KEYS, 'START_DATE', 'END_DATE', 'NUM_CONTAINERS']].reset_index(drop=True)
+
+
+class ContainerCounts:
+    """
+    As-of lookups of the number of containers on a container count history, without materializing
+    a daily grid. The history is sorted once, every query batch is answered by a binary search.
+    """
+
+    def __init__(self, history: pd.DataFrame):
+        history = history.sort_values([*HISTORY_KEYS, 'START_DATE'])
+
+        self.__keys = pd.MultiIndex.from_frame(history[HISTORY_KEYS].drop_duplicates())
+        codes = self.__keys.get_indexer(pd.MultiIndex.from_frame(history[HISTORY_KEYS]))
+        self.__index = AsOfIndex(codes, to_days(history['START_DATE']))
+        ends = pd.to_datetime(history['END_DATE'])
+        self.__ends = np.where(ends.isna(), np.iinfo(np.int64).max, to_days(ends))
+        self.__counts = history['NUM_CONTAINERS'].to_numpy()
+
+    def at(self, location_ids, material_ids, dates) -> np.ndarray:
+        """
+        Returns the number of containers for aligned arrays of locations, materials and dates.
+
+        Parameters:
+            location_ids: LOCATION_IDs of the queries.
+            material_ids: MATERIAL_TYPE_IDs (MATERIAL_ID in the activities) of the queries.
+            dates: Dates of the queries.
+
+        Returns:
+            np.ndarray: The number of containers, 0 for unknown locations and uncovered days.
+        """
+        location_ids, material_ids = np.atleast_1d(location_ids), np.atleast_1d(material_ids)
+        days = to_days(np.atleast_1d(dates))
+        if len(self.__index) == 0:
+            return np.zeros(days.size, dtype=np.int64)
+        codes = self.__keys.get_indexer(pd.MultiIndex.from_arrays([location_ids, material_ids]))
+
+        positions, found = self.__index.lookup(codes, days)
+        found &= days <= self.__ends[positions]
+        return np.where(found, self.__counts[positions], 0)
@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+
+from glas_o_mat.spatial import LocationIndex
+
+# Dynamic radius of container_density.ipynb: RADIUS_BASE / sqrt(population density), clipped in km
+RADIUS_BASE = 1000
+MIN_RADIUS_KM = 1
+MAX_RADIUS_KM = 5
+
+# Region types whose containers are counted for a location of the region type
+REGION_NEIGHBOURS = {
+    'Stadt': ['Stadt'],
+    'Land': ['Land'],
+    'Vorort': ['Vorort', 'Stadt'],
+}
+
+CONTAINER_COUNT_COLUMNS = ['NUM_CONTAINER_WHITE', 'NUM_CONTAINER_GREEN', 'NUM_CONTAINER_BROWN']
+
+
+def dynamic_radius_km(population_density) -> np.ndarray:
+    """
+    Calculates the radius from the population density, the maximum radius if the density is
+    missing or not positive.
+    """
+    population_density = np.asarray(population_density, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        radius = np.clip(RADIUS_BASE / np.sqrt(population_density), MIN_RADIUS_KM, MAX_RADIUS_KM)
+    return np.where(population_density > 0, radius, MAX_RADIUS_KM)
+
+
+def container_density(locations: pd.DataFrame, attributes: pd.DataFrame | None = None,
+                      region_column: str | None = None, lat_column: str = 'NEW_LAT',
+                      lon_column: str = 'NEW_LON') -> pd.DataFrame:
+    """
+    Calculates the number of containers per km² within the dynamic radius of every location.
+    All locations are queried at once against a KD-tree with one radius per location.
+
+    Parameters:
+        locations (pd.DataFrame): One row per location with 'LOCATION_ID', coordinates and
+                                  'POPULATION_DENSITY' or 'RADIUS_KM'.
+        attributes (pd.DataFrame | None): ContainerLocationAttributes.csv, every location is
+                                          weighted by its number of containers. Locations
+                                          missing there count as none. Without it every
+                                          location counts as one container.
+        region_column (str | None): Column of the region type, only the containers of the
+                                    region types in REGION_NEIGHBOURS are counted.
+        lat_column (str): Column of the latitude.
+        lon_column (str): Column of the longitude.
+
+    Returns:
+        pd.DataFrame: 'LOCATION_ID', 'RADIUS_KM', 'NUM_CONTAINERS_NEARBY' and 'CONTAINER_DENSITY',
+                      NaN for locations without coordinates.
+    """
+    location_ids = locations['LOCATION_ID'].to_numpy()
+    lat = locations[lat_column].to_numpy(dtype=float)
+    lon = locations[lon_column].to_numpy(dtype=float)
+    if 'RADIUS_KM' in locations:
+        radius = locations['RADIUS_KM'].to_numpy(dtype=float)
+    else:
+        radius = dynamic_radius_km(locations['POPULATION_DENSITY'])
+
+    if attributes is None:
+        weights = np.ones(len(locations))
+    else:
+        counts = attributes.groupby('LOCATION_ID')[CONTAINER_COUNT_COLUMNS].sum().sum(axis=1)
+        weights = counts.reindex(location_ids).fillna(0).to_numpy(dtype=float)
+    weight_index = pd.Index(location_ids)
+
+    # Every region type is queried against a tree of the locations it counts
+    if region_column is None:
+        groups = [(np.arange(len(locations)), np.arange(len(locations)))]
+    else:
+        regions = locations[region_column]
+        groups = []
+        for region in regions.dropna().unique():
+            neighbours = regions.isin(REGION_NEIGHBOURS.get(region, [region])).to_numpy()
+            groups.append((np.flatnonzero(regions.to_numpy() == region), np.flatnonzero(neighbours)))
+
+    nearby = np.zeros(len(locations))
+    for queries, candidates in groups:
+        index = LocationIndex(location_ids[candidates], lat[candidates], lon[candidates])
+        points, matches = index.within(lat[queries], lon[queries], radius[queries] * 1000)
+        nearby[queries] += np.bincount(points, weights[weight_index.get_indexer(matches)], len(queries))
+
+    missing = np.isnan(lat) | np.isnan(lon)
+    if region_column is not None:
+        missing |= locations[region_column].isna().to_numpy()
+    nearby[missing] = np.nan
+
+    return pd.DataFrame({
+        'LOCATION_ID': location_ids,
+        'RADIUS_KM': radius,
+        'NUM_CONTAINERS_NEARBY': nearby,
+        'CONTAINER_DENSITY': nearby / (np.pi * radius ** 2),
+    })
+
+
+def add_container_density(activities: pd.DataFrame, attributes: pd.DataFrame | None = None,
+                          region_column: str | None = None, lat_column: str = 'NEW_LAT',
+                          lon_column: str = 'NEW_LON') -> pd.DataFrame:
+    """
+    Adds the container density of the location of every activity. The density is calculated
+    once per LOCATION_ID from the last coordinates of the location in the activities.
+
+    Parameters:
+        activities (pd.DataFrame): Activities with 'LOCATION_ID', coordinates and
+                                   'POPULATION_DENSITY' or 'RADIUS_KM'.
+        attributes, region_column, lat_column, lon_column: See container_density.
+
+    Returns:
+        pd.DataFrame: The activities with added columns 'RADIUS_KM' and 'CONTAINER_DENSITY'.
+    """
+    locations = activities.drop_duplicates('LOCATION_ID', keep='last')
+    densities = container_density(locations, attributes, region_column, lat_column, lon_column)
+    densities = densities.set_index('LOCATION_ID')[['RADIUS_KM', 'CONTAINER_DENSITY']]
+
+    activities = activities.drop(columns=densities.columns, errors='ignore')
+    return activities.join(densities, on='LOCATION_ID')
@@ -1,6 +1,136 @@
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import os
+import threading
+
 import pandas as pd
 import numpy as np
 
+from glas_o_mat import profiling
+from glas_o_mat.cache import FrameCache
+from glas_o_mat.distances import DistanceMatrix, convert_distance_matrix
+from glas_o_mat.partitions import convert_activities_to_partitions, disposition_area_ids, read_activity_partitions
+from glas_o_mat.prediction import LevelPredictor
+from glas_o_mat.spatial import add_versioned_coordinates
+
+
+ACTIVITIES_FILE = 'ContainerActivities.csv'
+CONTAINERS_FILE = 'Containers.csv'
+LOCATIONS_FILE = 'Locations.csv'
+CONSTRUCTION_TYPES_FILE = 'ConstructionTypes.csv'
+DISTANCE_MATRIX_FILE = 'DistanceMatrix.csv'
+VERSIONED_LOCATIONS_FILE = 'modified_data/Locations_cleaned.csv'
+AGGREGATED_SOURCES = (ACTIVITIES_FILE, CONTAINERS_FILE, CONSTRUCTION_TYPES_FILE)
+
+# Frames (and objects derived from them) of a Dataset and what they are built from
+FRAME_DEPENDENCIES = {
+    'locations': (),
+    'activities': (),
+    'containers': (),
+    'construction_types': (),
+    'aggregated': ('activities', 'containers', 'construction_types'),
+    'distances': (),
+    'versioned_locations': (),
+    'predictor': ('aggregated',),
+}
+# Frames loaded by Dataset.preload, dependencies first
+PRELOAD_FRAMES = ('activities', 'containers', 'locations', 'construction_types', 'aggregated')
+
+# Directory of the processed frame cache, relative to the data folder
+CACHE_DIR = 'cache'
+
+# Directory of the converted distance matrix, inside the cache (or data) folder
+DISTANCE_MATRIX_DIR = 'distance_matrix'
+
+# Directory of the activities partitioned by disposition area and month, inside the cache (or data)
+# folder. Only used by filtered datasets. The months before since are read as well, they are the
+# history the intervals of the first activities in the window are calculated from.
+PARTITIONS_DIR = 'activity_partitions'
+
+# Columns and types read in typed mode, unused columns (COMMENT, IMAGE_ID, ...) are skipped
+ACTIVITY_DTYPES = {
+    'TRANSACTION_ID': 'int64',
+    'CONTAINER_ID': 'int64',
+    'SLIDER_LEVEL': 'int16',
+    'CV_LEVEL': 'float32',
+    'SENSOR_LEVEL': 'float32',
+    'PHONE_ID': 'category',
+    'RECORDED_AT': 'str',
+    'IS_EMPTIED': 'int8',
+    'LATITUDE': 'float64',
+    'LONGITUDE': 'float64',
+}
+# Maximum delay of a late activity (e.g. uploaded from an offline phone) when streaming
+STREAM_MAX_DELAY = pd.Timedelta(days=14)
+
+CONTAINER_DTYPES = {
+    'CONTAINER_ID': 'int64',
+    'LOCATION_ID': 'int64',
+    'MATERIAL_TYPE_ID': 'int8',
+    'CONSTRUCTION_TYPE_ID': 'float32',
+    'IS_ACTIVE': 'int8',
+}
+
+
+def clean_activity_arrays(container_ids: np.ndarray, recorded_at: np.ndarray,
+                          is_emptied: np.ndarray) -> tuple[np.ndarray, ...]:
+    """
+    Cleans the activities in a single pass over arrays sorted by (CONTAINER_ID, RECORDED_AT):
+    the first activity of every container is dropped (it has no interval), only the last
+    activity per container and day is kept with the emptied flag of the whole day, and the
+    intervals to the previous kept activity and to the previous kept emptying are calculated.
+
+    Parameters:
+        container_ids (np.ndarray): CONTAINER_ID of the activities, ordered by RECORDED_AT.
+        recorded_at (np.ndarray): RECORDED_AT of the activities as datetime64[ns].
+        is_emptied (np.ndarray): IS_EMPTIED of the activities.
+
+    Returns:
+        tuple[np.ndarray, ...]: The positions of the kept activities in their original order,
+                                and their IS_EMPTIED, INTERVAL and EMPTIED_INTERVAL.
+    """
+    order = np.argsort(container_ids, kind='stable')
+    containers = container_ids[order]
+    times = recorded_at[order]
+    days = times.astype('datetime64[D]')
+    emptied = is_emptied[order]
+
+    # drop the first activity of every container
+    first = np.ones(order.size, dtype=bool)
+    first[1:] = containers[1:] != containers[:-1]
+    valid = np.flatnonzero(~first)
+    containers, times, days, emptied = containers[valid], times[valid], days[valid], emptied[valid]
+
+    # day-level dedup: keep the last activity per container and day with the day's maximum flag
+    new_day = np.ones(valid.size, dtype=bool)
+    new_day[1:] = (containers[1:] != containers[:-1]) | (days[1:] != days[:-1])
+    day_starts = np.flatnonzero(new_day)
+    last = np.append(day_starts, valid.size)[1:] - 1
+    emptied = np.maximum.reduceat(emptied, day_starts)
+    containers, times = containers[last], times[last]
+
+    # intervals to the previous kept activity and the previous kept emptying of the container
+    same_container = np.zeros(last.size, dtype=bool)
+    same_container[1:] = containers[1:] == containers[:-1]
+    interval = np.full(last.size, np.timedelta64('NaT'), dtype='timedelta64[ns]')
+    interval[1:][same_container[1:]] = (times[1:] - times[:-1])[same_container[1:]]
+
+    emptied_positions = np.flatnonzero(emptied == 1)
+    emptied_times = times[emptied_positions]
+    emptied_containers = containers[emptied_positions]
+    previous = np.zeros(emptied_positions.size, dtype=bool)
+    previous[1:] = emptied_containers[1:] == emptied_containers[:-1]
+    emptied_interval = np.full(last.size, np.timedelta64('NaT'), dtype='timedelta64[ns]')
+    emptied_interval[emptied_positions[1:][previous[1:]]] = \
+        (emptied_times[1:] - emptied_times[:-1])[previous[1:]]
+
+    # back to the original order
+    positions = order[valid[last]]
+    restore = np.argsort(positions)
+    return positions[restore], emptied[restore], interval[restore], emptied_interval[restore]
+
 
 class DataframeWrapper(pd.DataFrame):
     pass
@@ -8,14 +138,29 @@ class DataframeWrapper(pd.DataFrame):
 
 class Dataset:
 
-    def __init__(self, path: str):
+    def __init__(self, path: str, cache_dir: str | None = None, typed: bool = False,
+                 areas: list[int] | None = None, since: str | pd.Timestamp | None = None,
+                 until: str | pd.Timestamp | None = None):
         super().__init__()
         self.__path = path
-        self.__activities = None
-        self.__locations = None
-        self.__containers = None
-        self.__construction_types = None
-        self.__aggregated = None
+        self.__typed = typed
+        self.__areas = None if areas is None else sorted({int(area) for area in areas})
+        self.__since = None if since is None else pd.Timestamp(since).normalize()
+        self.__until = None if until is None else pd.Timestamp(until).normalize()
+        self.__cache = FrameCache(cache_dir) if cache_dir is not None else None
+        self.__raw_activities = None
+        self.__frames = dict.fromkeys(FRAME_DEPENDENCIES)
+        self.__locks = {name: threading.Lock() for name in FRAME_DEPENDENCIES}
+        self.__loaders = {
+            'locations': self.__load_locations,
+            'activities': self.__load_activities,
+            'containers': self.__load_containers,
+            'construction_types': self.__load_construction_types,
+            'aggregated': self.__load_aggregated,
+            'distances': self.__load_distances,
+            'versioned_locations': self.__load_versioned_locations,
+            'predictor': self.__load_predictor,
+        }
 
     @property
     def path(self) -> str:
@@ -23,114 +168,486 @@ class Dataset:
 
     @property
     def activities(self) -> pd.DataFrame:
-        if self.__activities is None:
-            self.__load_activities()
-        return self.__activities
+        return self.__frame('activities')
 
     @property
     def locations(self) -> pd.DataFrame:
-        if self.__locations is None:
-            self.__load_locations()
-        return self.__locations
+        return self.__frame('locations')
 
     @property
     def construction_types(self) -> pd.DataFrame:
-        if self.__construction_types is None:
-            self.__load_construction_types()
-        return self.__construction_types
+        return self.__frame('construction_types')
 
     @property
     def aggregated(self) -> pd.DataFrame:
-        if self.__aggregated is None:
-            self.__load_aggregated()
-        return self.__aggregated
+        return self.__frame('aggregated')
 
     @property
     def containers(self) -> pd.DataFrame:
-        if self.__containers is None:
-            self.__load_containers()
-        return self.__containers
-
-    def preload(self):
-        self.__load_locations()
-        self.__load_activities()
-        self.__load_containers()
-        self.__load_construction_types()
-        self.__load_aggregated()
-
-    def __load_aggregated(self):
-        self.__aggregated = pd.merge(self.activities, self.containers, on='CONTAINER_ID',
-                                     how='left', validate='many_to_one')
-        self.__aggregated.loc[
-            self.__aggregated['CONSTRUCTION_TYPE_ID'].isna(), 'CONSTRUCTION_TYPE_ID'] = 1
-        self.__aggregated = pd.merge(self.__aggregated, self.construction_types,
-                                     on='CONSTRUCTION_TYPE_ID', how='inner', validate='many_to_one')
-        self.__aggregated['LEVEL'] = self.__aggregated['SLIDER_LEVEL'] * self.__aggregated[
-            'VOLUME'] / 100
-
-    def __load_containers(self):
-        self.__containers = pd.read_csv(f'{self.path}/Containers.csv')
-
-    def __load_locations(self):
-        self.__locations = pd.read_csv(f'{self.path}/Locations.csv')
-
-    def __load_construction_types(self):
-        self.__construction_types = pd.read_csv(f'{self.path}/ConstructionTypes.csv')
-
-    def __load_activities(self):
-        self.__activities = pd.read_csv(f'{self.path}/ContainerActivities.csv')
+        return self.__frame('containers')
+
+    @property
+    def distances(self) -> DistanceMatrix:
+        return self.__frame('distances')
+
+    @property
+    def versioned_locations(self) -> pd.DataFrame:
+        return self.__frame('versioned_locations')
+
+    @property
+    def predictor(self) -> LevelPredictor:
+        return self.__frame('predictor')
+
+    @property
+    def cache(self) -> FrameCache | None:
+        return self.__cache
+
+    @property
+    def typed(self) -> bool:
+        return self.__typed
+
+    @property
+    def areas(self) -> list[int] | None:
+        return self.__areas
+
+    @property
+    def since(self) -> pd.Timestamp | None:
+        return self.__since
+
+    @property
+    def until(self) -> pd.Timestamp | None:
+        return self.__until
+
+    @property
+    def filtered(self) -> bool:
+        return self.__areas is not None or self.__since is not None or self.__until is not None
+
+    def memory_usage(self) -> pd.Series:
+        """
+        Memory footprint of the loaded frames in bytes, including the contents of object columns.
+        """
+        return pd.Series({name: int(frame.memory_usage(deep=True).sum())
+                          for name, frame in self.__frames.items() if isinstance(frame, pd.DataFrame)},
+                         dtype='int64')
+
+    def activities_with_coordinates(self, strict: bool = False) -> pd.DataFrame:
+        """
+        The activities with the location coordinates valid at their RECORDED_AT according to
+        the versioned locations (LOCATION_LAT, LOCATION_LON), see CoordinateHistory.at.
+        """
+        return add_versioned_coordinates(self.activities, self.versioned_locations, strict)
+
+    def predict_levels(self, container_ids, at_time) -> np.ndarray:
+        """
+        Predict the fill levels (LEVEL) of a batch of containers on the day of at_time, see
+        LevelPredictor.predict_levels.
+        """
+        return self.predictor.predict_levels(container_ids, at_time)
 
+    def preload(self, max_workers: int | None = None):
+        """
+        Load all frames. Independent files are read concurrently in a thread pool, a frame
+        waits only for the frames it is built from.
+        """
+        with ThreadPoolExecutor(max_workers=max_workers or len(PRELOAD_FRAMES)) as executor:
+            for future in [executor.submit(self.__frame, name) for name in PRELOAD_FRAMES]:
+                future.result()
+
+    def invalidate(self, name: str):
+        """
+        Drop a loaded frame and everything built from it (e.g. 'containers' also drops
+        'aggregated' and 'predictor'), they are loaded again on the next access.
+        """
+        if name not in FRAME_DEPENDENCIES:
+            raise ValueError(f'Unknown frame {name}, expected one of {list(FRAME_DEPENDENCIES)}')
+
+        invalidated = {name}
+        for frame, dependencies in FRAME_DEPENDENCIES.items():
+            if invalidated.intersection(dependencies):
+                invalidated.add(frame)
+        for frame in invalidated:
+            with self.__locks[frame]:
+                self.__frames[frame] = None
+                if frame == 'activities':
+                    self.__raw_activities = None
+
+    def __frame(self, name: str):
+        # Double-checked locking: every frame is built once, concurrent readers wait for it
+        frame = self.__frames[name]
+        if frame is None:
+            with self.__locks[name]:
+                frame = self.__frames[name]
+                if frame is None:
+                    frame = self.__loaders[name]()
+                    self.__frames[name] = frame
+        return frame
+
+    def __sources(self, *files: str) -> list[str]:
+        return [f'{self.path}/{file}' for file in files]
+
+    def __cache_key(self) -> dict:
+        return {
+            'typed': self.__typed,
+            'areas': self.__areas,
+            'since': None if self.__since is None else self.__since.isoformat(),
+            'until': None if self.__until is None else self.__until.isoformat(),
+        }
+
+    def __cache_name(self, name: str) -> str:
+        # filtered frames are cached next to the unfiltered ones instead of replacing them
+        if not self.filtered:
+            return name
+        digest = hashlib.sha256(json.dumps(self.__cache_key(), sort_keys=True).encode()).hexdigest()
+        return f'{name}-{digest[:12]}'
+
+    def __read_cache(self, name: str, *files: str) -> pd.DataFrame | None:
+        if self.__cache is None:
+            return None
+        with profiling.stage(f'{name}.read_cache') as record:
+            frame = self.__cache.read(self.__cache_name(name), self.__sources(*files),
+                                      key=self.__cache_key())
+            record.rows_out = None if frame is None else len(frame)
+        return frame
+
+    def __write_cache(self, name: str, frame: pd.DataFrame, *files: str):
+        if self.__cache is not None:
+            self.__cache.write(self.__cache_name(name), self.__sources(*files), frame,
+                               key=self.__cache_key())
+
+    def __load_aggregated(self) -> pd.DataFrame:
+        aggregated = self.__read_cache('aggregated', *AGGREGATED_SOURCES)
+        if aggregated is None:
+            aggregated = self.__aggregate(self.activities)
+            self.__write_cache('aggregated', aggregated, *AGGREGATED_SOURCES)
+        return aggregated
+
+    @profiling.profiled('aggregated.merge')
+    def __aggregate(self, activities: pd.DataFrame) -> pd.DataFrame:
+        aggregated = pd.merge(activities, self.containers, on='CONTAINER_ID',
+                              how='left', validate='many_to_one')
+        aggregated.loc[aggregated['CONSTRUCTION_TYPE_ID'].isna(), 'CONSTRUCTION_TYPE_ID'] = 1
+        aggregated = pd.merge(aggregated, self.construction_types,
+                              on='CONSTRUCTION_TYPE_ID', how='inner', validate='many_to_one')
+        aggregated['LEVEL'] = aggregated['SLIDER_LEVEL'] * aggregated['VOLUME'] / 100
+        return aggregated
+
+    def __load_containers(self) -> pd.DataFrame:
+        containers = self.__read_cache('containers', CONTAINERS_FILE)
+        if containers is None:
+            with profiling.stage('containers.read_csv') as record:
+                if self.__typed:
+                    containers = pd.read_csv(f'{self.path}/{CONTAINERS_FILE}',
+                                             usecols=list(CONTAINER_DTYPES), dtype=CONTAINER_DTYPES)
+                else:
+                    containers = pd.read_csv(f'{self.path}/{CONTAINERS_FILE}')
+                if self.__areas is not None:
+                    containers = containers[np.isin(disposition_area_ids(containers['CONTAINER_ID']),
+                                                    self.__areas)].reset_index(drop=True)
+                record.rows_out = len(containers)
+            self.__write_cache('containers', containers, CONTAINERS_FILE)
+        return containers
+
+    def __load_locations(self) -> pd.DataFrame:
+        locations = self.__read_cache('locations', LOCATIONS_FILE)
+        if locations is None:
+            with profiling.stage('locations.read_csv') as record:
+                locations = pd.read_csv(f'{self.path}/{LOCATIONS_FILE}')
+                if self.__areas is not None:
+                    locations = locations[locations['DISPOSITION_AREA_ID'].isin(self.__areas)]
+                    locations = locations.reset_index(drop=True)
+                record.rows_out = len(locations)
+            self.__write_cache('locations', locations, LOCATIONS_FILE)
+        return locations
+
+    def __load_distances(self) -> DistanceMatrix:
+        directory = self.__converted(DISTANCE_MATRIX_DIR, DISTANCE_MATRIX_FILE, convert_distance_matrix)
+        return DistanceMatrix(directory)
+
+    def __converted(self, name: str, file: str, convert) -> str:
+        """
+        Returns the directory of a conversion of a source file, inside the cache folder or, without
+        a cache, the data folder. The conversion is rebuilt whenever the source file changed, its
+        fingerprint is recorded next to the directory.
+        """
+        cache = self.__cache if self.__cache is not None else FrameCache(self.path)
+        directory = os.path.join(cache.directory, name)
+        sources = self.__sources(file)
+        if not cache.is_fresh(name, sources) or not os.path.isdir(directory):
+            convert(sources[0], directory)
+            cache.record(name, sources)
+        return directory
+
+    def __load_construction_types(self) -> pd.DataFrame:
+        with profiling.stage('construction_types.read_csv') as record:
+            construction_types = pd.read_csv(f'{self.path}/{CONSTRUCTION_TYPES_FILE}')
+            record.rows_out = len(construction_types)
+        return construction_types
+
+    def __load_versioned_locations(self) -> pd.DataFrame:
+        return pd.read_csv(f'{self.path}/{VERSIONED_LOCATIONS_FILE}',
+                           parse_dates=['START_DATUM', 'END_DATUM'])
+
+    def __load_predictor(self) -> LevelPredictor:
+        return LevelPredictor(self.aggregated)
+
+    def __load_activities(self) -> pd.DataFrame:
+        activities = self.__read_cache('activities', ACTIVITIES_FILE)
+        if activities is None:
+            activities = self.__trim_activities(self.__clean_activities(self.__load_raw_activities()))
+            self.__write_cache('activities', activities, ACTIVITIES_FILE)
+        return activities
+
+    def __load_raw_activities(self) -> pd.DataFrame:
+        raw_activities = self.__read_cache('raw_activities', ACTIVITIES_FILE)
+        if raw_activities is not None:
+            return raw_activities
+
+        if self.filtered:
+            raw_activities = self.__read_partitions()
+        else:
+            with profiling.stage('activities.read_csv') as record:
+                if self.__typed:
+                    raw_activities = pd.read_csv(f'{self.path}/{ACTIVITIES_FILE}',
+                                                 usecols=list(ACTIVITY_DTYPES), dtype=ACTIVITY_DTYPES)
+                else:
+                    raw_activities = pd.read_csv(f'{self.path}/{ACTIVITIES_FILE}')
+                record.rows_out = len(raw_activities)
+
+        raw_activities = self.__prepare_activities(raw_activities)
+        self.__write_cache('raw_activities', raw_activities, ACTIVITIES_FILE)
+        return raw_activities
+
+    def __read_partitions(self) -> pd.DataFrame:
+        directory = self.__converted(PARTITIONS_DIR, ACTIVITIES_FILE, convert_activities_to_partitions)
+
+        with profiling.stage('activities.read_partitions') as record:
+            raw_activities = read_activity_partitions(
+                directory, self.__areas, until=self.__until,
+                columns=list(ACTIVITY_DTYPES) if self.__typed else None)
+            if self.__typed:
+                raw_activities = raw_activities.astype(ACTIVITY_DTYPES)
+            record.rows_out = len(raw_activities)
+        return raw_activities
+
+    def __filter_activities(self, activities: pd.DataFrame) -> pd.DataFrame:
+        # since is not applied here, the earlier activities are needed for the cleaning
+        keep = np.ones(len(activities), dtype=bool)
+        if self.__areas is not None:
+            keep &= np.isin(disposition_area_ids(activities['CONTAINER_ID']), self.__areas)
+        if self.__until is not None:
+            keep &= (activities['RECORDED_AT'] < self.__until + pd.Timedelta(days=1)).to_numpy()
+        return activities[keep]
+
+    def __trim_activities(self, activities: pd.DataFrame) -> pd.DataFrame:
+        # drops the cleaned activities before since, their intervals reach back before the window
+        if self.__since is None:
+            return activities
+        return activities[(activities['RECORDED_AT'] >= self.__since).to_numpy()].reset_index(drop=True)
+
+    @profiling.profiled('activities.prepare')
+    def __prepare_activities(self, activities: pd.DataFrame) -> pd.DataFrame:
         # type conversion
-        self.__activities['RECORDED_AT'] = pd.to_datetime(self.__activities['RECORDED_AT'])
-        self.__activities['PHONE_ID'] = self.__activities['PHONE_ID'].astype(str)
+        with profiling.stage('activities.to_datetime', len(activities)):
+            activities['RECORDED_AT'] = pd.to_datetime(activities['RECORDED_AT'])
 
-        self.__activities.sort_values(['RECORDED_AT', 'TRANSACTION_ID'], inplace=True)
+        # filter by disposition area and last day before the sorting and deduplication, the cleaning
+        # only looks back so neither changes the kept activities
+        if self.filtered:
+            activities = self.__filter_activities(activities).copy()
+        if not self.__typed:
+            activities['PHONE_ID'] = activities['PHONE_ID'].astype(str)
+
+        activities.sort_values(['RECORDED_AT', 'TRANSACTION_ID'], inplace=True)
 
         # drop test phone
-        self.__activities = self.__activities[~self.__activities['PHONE_ID'].str.startswith('TKQ1')]
+        activities = activities[~activities['PHONE_ID'].str.startswith('TKQ1', na=False)].copy()
+        if self.__typed:
+            activities['PHONE_ID'] = activities['PHONE_ID'].cat.remove_unused_categories()
+
+        # calc location id from container id (<location id><material id><2 digits>)
+        activities['LOCATION_ID'] = (activities['CONTAINER_ID'] // 10000).astype(np.uint64)
+        activities['MATERIAL_ID'] = (activities['CONTAINER_ID'] % 10000 // 100).astype(
+            np.uint8 if self.__typed else np.uint64)
+        if self.__typed:
+            activities['DATE'] = activities['RECORDED_AT'].dt.normalize()
+        else:
+            activities['DATE'] = activities['RECORDED_AT'].dt.date.astype(str)
+
+        return activities
+
+    @staticmethod
+    @profiling.profiled('activities.clean')
+    def __clean_activities(activities: pd.DataFrame) -> pd.DataFrame:
+        keep, is_emptied, interval, emptied_interval = clean_activity_arrays(
+            activities['CONTAINER_ID'].to_numpy(),
+            activities['RECORDED_AT'].to_numpy(dtype='datetime64[ns]'),
+            activities['IS_EMPTIED'].to_numpy())
+
+        activities = activities.iloc[keep].reset_index(drop=True)
+        activities['IS_EMPTIED'] = is_emptied.astype(activities['IS_EMPTIED'].dtype)
+        activities['INTERVAL'] = interval
+        activities['EMPTIED_INTERVAL'] = emptied_interval
+        return activities
+
+    def iter_activities(self, chunksize: int = 100_000,
+                        max_delay: pd.Timedelta = STREAM_MAX_DELAY) -> Iterator[pd.DataFrame]:
+        """
+        Stream the cleaned activities in batches of complete days, reading the activities file in
+        chunks instead of loading it at once. The file has to be roughly ordered by RECORDED_AT,
+        an activity may arrive at most max_delay after later ones. The last RECORDED_AT and the
+        last emptying per container are carried across batches, so the concatenated batches
+        equal the activities frame.
+        """
+        if self.__typed:
+            reader = pd.read_csv(f'{self.path}/{ACTIVITIES_FILE}', usecols=list(ACTIVITY_DTYPES),
+                                 dtype=ACTIVITY_DTYPES, chunksize=chunksize)
+        else:
+            reader = pd.read_csv(f'{self.path}/{ACTIVITIES_FILE}', chunksize=chunksize)
+
+        buffer = None
+        horizon = None
+        state = pd.DataFrame({'LAST_RECORDED': pd.Series(dtype='datetime64[ns]'),
+                              'LAST_EMPTIED': pd.Series(dtype='datetime64[ns]')},
+                             index=pd.Index([], dtype=np.int64, name='CONTAINER_ID'))
+
+        for chunk in reader:
+            chunk = self.__prepare_activities(chunk)
+            if horizon is not None and (chunk['RECORDED_AT'] < horizon).any():
+                raise ValueError(f'Activity recorded before {horizon:%Y-%m-%d} arrived after this '
+                                 f'day was streamed, increase max_delay')
+            buffer = chunk if buffer is None else pd.concat([buffer, chunk])
+            if buffer.empty:
+                continue
+
+            # days before the horizon are complete and can be emitted
+            new_horizon = buffer['RECORDED_AT'].max().normalize() - max_delay
+            if horizon is not None and new_horizon <= horizon:
+                continue
+            horizon = new_horizon
+            ready = buffer['RECORDED_AT'] < horizon
+            if ready.any():
+                batch, state = self.__clean_activity_batch(buffer[ready], state)
+                buffer = buffer[~ready]
+                batch = self.__trim_activities(batch)
+                if not batch.empty:
+                    yield batch
+
+        if buffer is not None and not buffer.empty:
+            batch, _ = self.__clean_activity_batch(buffer, state)
+            batch = self.__trim_activities(batch)
+            if not batch.empty:
+                yield batch
+
+    @staticmethod
+    def __clean_activity_batch(batch: pd.DataFrame, state: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+        batch = batch.sort_values(['RECORDED_AT', 'TRANSACTION_ID'])
+
+        # containers of earlier batches are continued by rows in front of the batch: a placeholder
+        # for their dropped first activity, their last kept emptying and their last kept activity
+        carried = state[state.index.isin(batch['CONTAINER_ID'])]
+        last_emptied = carried['LAST_EMPTIED'].dropna()
+        last_recorded = carried['LAST_RECORDED'][carried['LAST_RECORDED'] != carried['LAST_EMPTIED']].dropna()
+        carry_sizes = [len(carried), len(last_emptied), len(last_recorded)]
+
+        container_ids = np.concatenate([carried.index, last_emptied.index, last_recorded.index,
+                                        batch['CONTAINER_ID']]).astype(np.int64)
+        recorded_at = np.concatenate([np.full(len(carried), np.datetime64('NaT'), dtype='datetime64[ns]'),
+                                      last_emptied.to_numpy(dtype='datetime64[ns]'),
+                                      last_recorded.to_numpy(dtype='datetime64[ns]'),
+                                      batch['RECORDED_AT'].to_numpy(dtype='datetime64[ns]')])
+        is_emptied = np.concatenate([np.repeat([0, 1, 0], carry_sizes), batch['IS_EMPTIED'].to_numpy()])
+        keep, emptied, interval, emptied_interval = clean_activity_arrays(container_ids, recorded_at, is_emptied)
+
+        # the state is the last kept activity and emptying of every container seen so far
+        kept = pd.DataFrame({'CONTAINER_ID': container_ids[keep], 'RECORDED_AT': recorded_at[keep]})
+        updated = pd.DataFrame({
+            'LAST_RECORDED': kept.groupby('CONTAINER_ID')['RECORDED_AT'].last(),
+            'LAST_EMPTIED': kept[emptied == 1].groupby('CONTAINER_ID')['RECORDED_AT'].last(),
+        }).reindex(pd.unique(batch['CONTAINER_ID']))
+        state = pd.concat([state[~state.index.isin(updated.index)], updated])
+
+        # only the rows of the batch are emitted
+        in_batch = keep >= sum(carry_sizes)
+        batch = batch.iloc[keep[in_batch] - sum(carry_sizes)].reset_index(drop=True)
+        batch['IS_EMPTIED'] = emptied[in_batch].astype(batch['IS_EMPTIED'].dtype)
+        batch['INTERVAL'] = interval[in_batch]
+        batch['EMPTIED_INTERVAL'] = emptied_interval[in_batch]
+        return batch, state
 
-        # calc location id from container id and material type
-        self.__activities['LOCATION_ID'] = self.__activities['CONTAINER_ID'].astype(str).str.slice(
-            0, -4).astype(np.uint64)
-        self.__activities['MATERIAL_ID'] = self.__activities['CONTAINER_ID'].astype(str).str.slice(
-            -4, -2).astype(np.uint64)
-        self.__activities['DATE'] = self.__activities['RECORDED_AT'].dt.date.astype(str)
+    def ingest(self, new_rows: pd.DataFrame) -> np.ndarray:
+        """
+        Merge a batch of new or updated activities (e.g. from UpdatedActivities.csv) by
+        TRANSACTION_ID. Intervals, the emptied flag and the daily deduplication are only
+        recomputed for the containers touched by the batch, and a loaded aggregated frame is
+        updated accordingly, as are the cached predictions of the touched containers. The source
+        files and the cache are left untouched.
+        Returns the touched container ids.
+        """
+        if self.__raw_activities is None:
+            self.__raw_activities = self.__load_raw_activities()
+        activities = self.activities
 
-        # calc intervals
-        self.__calc_intervals()
+        # bring the batch into the raw format, the last row per transaction wins
+        new_rows = new_rows.drop_duplicates(subset=['TRANSACTION_ID'], keep='last')
+        new_rows = new_rows.drop(columns=['LOCATION_ID', 'MATERIAL_ID', 'DATE'], errors='ignore')
+        if self.__typed:
+            new_rows = new_rows[list(ACTIVITY_DTYPES)].astype(ACTIVITY_DTYPES)
+        replaced = self.__raw_activities['TRANSACTION_ID'].isin(new_rows['TRANSACTION_ID'])
+        touched = pd.unique(pd.concat([self.__raw_activities.loc[replaced, 'CONTAINER_ID'],
+                                       new_rows['CONTAINER_ID']]).astype(np.int64))
+        new_rows = self.__prepare_activities(new_rows.copy())
 
-        # cleanup - remove duplicates
-        self.__activities.dropna(subset=['INTERVAL'], inplace=True)
-        self.__activities['IS_EMPTIED'] = \
-            self.__activities.groupby(['CONTAINER_ID', 'DATE'])['IS_EMPTIED'].cummax()
-        self.__activities.drop_duplicates(subset=['CONTAINER_ID', 'DATE'], inplace=True,
-                                          keep='last')
+        # merge the batch into the raw activities
+        raw_activities = pd.concat([self.__raw_activities[~replaced], new_rows], ignore_index=True)
+        raw_activities.sort_values(['RECORDED_AT', 'TRANSACTION_ID'], inplace=True)
+        self.__raw_activities = self.__restore_categories(raw_activities)
 
-        # calc intervals
-        self.__calc_intervals()
+        # recompute the touched containers only
+        recomputed = self.__trim_activities(self.__clean_activities(
+            self.__raw_activities[self.__raw_activities['CONTAINER_ID'].isin(touched)]))
+        self.__frames['activities'] = self.__merge_recomputed(activities, recomputed, touched)
+        if self.__frames['aggregated'] is not None:
+            self.__frames['aggregated'] = self.__merge_recomputed(self.__frames['aggregated'],
+                                                                  self.__aggregate(recomputed), touched)
+        if self.__frames['predictor'] is not None:
+            self.__frames['predictor'].update(self.__frames['aggregated'], touched)
 
-        self.__activities.reset_index(drop=True, inplace=True)
+        return touched
 
-    def __calc_intervals(self):
-        self.__activities['INTERVAL'] = self.__activities. \
-            groupby('CONTAINER_ID')['RECORDED_AT'].diff()
-        self.__activities['EMPTIED_INTERVAL'] = \
-            self.__activities[self.__activities['IS_EMPTIED'] == 1]. \
-                groupby('CONTAINER_ID')['RECORDED_AT'].diff()
+    def __merge_recomputed(self, frame: pd.DataFrame, recomputed: pd.DataFrame,
+                           touched: np.ndarray) -> pd.DataFrame:
+        frame = pd.concat([frame[~frame['CONTAINER_ID'].isin(touched)], recomputed],
+                          ignore_index=True)
+        frame.sort_values(['RECORDED_AT', 'TRANSACTION_ID'], inplace=True, kind='mergesort')
+        frame.reset_index(drop=True, inplace=True)
+        return self.__restore_categories(frame)
 
+    def __restore_categories(self, frame: pd.DataFrame) -> pd.DataFrame:
+        if self.__typed and frame['PHONE_ID'].dtype != 'category':
+            frame['PHONE_ID'] = frame['PHONE_ID'].astype('category')
+        return frame
 
 
-def create_dataset() -> Dataset:
+def create_dataset(typed: bool = False, areas: list[int] | None = None,
+                   since: str | pd.Timestamp | None = None,
+                   until: str | pd.Timestamp | None = None) -> Dataset:
     """
-    Create a new dataset object.
+    Create a new dataset object. Processed frames are cached in the data folder.
+    With typed=True, only the used columns are loaded with compact types.
+    With areas, since and until, only the activities of these disposition areas recorded between
+    these days (inclusive) are loaded. Their intervals are calculated from the whole history before
+    since, so they equal those of the unfiltered activities.
     """
-    return Dataset('../data')
+    return Dataset('../data', cache_dir=f'../data/{CACHE_DIR}', typed=typed,
+                   areas=areas, since=since, until=until)
 
 
-def load_data() -> Dataset:
+def load_data(typed: bool = False, areas: list[int] | None = None,
+              since: str | pd.Timestamp | None = None,
+              until: str | pd.Timestamp | None = None) -> Dataset:
     """
     Load the dataset from the data folder. This function preloads the data into memory.
     """
-    dataset = create_dataset()
+    dataset = create_dataset(typed, areas, since, until)
     dataset.preload()
     return dataset
@@ -0,0 +1,131 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Metrics of the DistanceMatrix.csv stored as dense matrices
+DISTANCE_METRICS = ('LENGTH', 'DURATION')
+DISTANCE_DTYPE = np.float32
+
+# File holding the sorted LOCATION_IDs, row i of every matrix belongs to the i-th LOCATION_ID
+INDEX_FILE = 'location_ids.npy'
+
+# Rows of the CSV parsed at once, POLYLINE and ROUTE_INFO are never read
+CONVERT_CHUNK_SIZE = 500_000
+
+
+def convert_distance_matrix(csv_path: str, directory: str, chunksize: int = CONVERT_CHUNK_SIZE):
+    """
+    Converts the pairwise DistanceMatrix.csv into dense float32 matrices, one .npy file per metric,
+    plus the LOCATION_ID index. Pairs listed in one direction only are mirrored, missing pairs are
+    NaN and the diagonal is 0.
+
+    Parameters:
+        csv_path (str): Path of the DistanceMatrix.csv.
+        directory (str): Directory the matrices are written to.
+        chunksize (int): Number of CSV rows parsed at once.
+    """
+    columns = ['START_LOCATION_ID', 'END_LOCATION_ID', *DISTANCE_METRICS]
+    dtypes = {'START_LOCATION_ID': 'int64', 'END_LOCATION_ID': 'int64',
+              **{metric: 'float32' for metric in DISTANCE_METRICS}}
+
+    # First pass: collect the LOCATION_IDs
+    location_ids = np.zeros(0, dtype=np.int64)
+    for chunk in pd.read_csv(csv_path, usecols=columns[:2], dtype=dtypes, chunksize=chunksize):
+        location_ids = np.union1d(location_ids, chunk.to_numpy().ravel())
+
+    os.makedirs(directory, exist_ok=True)
+    matrices = {}
+    for metric in DISTANCE_METRICS:
+        matrix = np.lib.format.open_memmap(os.path.join(directory, f'{metric}.npy.tmp'), mode='w+',
+                                           dtype=DISTANCE_DTYPE,
+                                           shape=(location_ids.size, location_ids.size))
+        matrix[:] = np.nan
+        np.fill_diagonal(matrix, 0)
+        matrices[metric] = matrix
+
+    # Second pass: fill the matrices, the reverse direction only where it is not given explicitly
+    given = np.zeros((location_ids.size, location_ids.size), dtype=bool)
+    for chunk in pd.read_csv(csv_path, usecols=columns, dtype=dtypes, chunksize=chunksize):
+        starts = np.searchsorted(location_ids, chunk['START_LOCATION_ID'].to_numpy())
+        ends = np.searchsorted(location_ids, chunk['END_LOCATION_ID'].to_numpy())
+        given[starts, ends] = True
+        for metric, matrix in matrices.items():
+            matrix[starts, ends] = chunk[metric].to_numpy()
+    for matrix in matrices.values():
+        mirrored = ~given & given.T
+        matrix[mirrored] = matrix.T[mirrored]
+        matrix.flush()
+
+    for metric in DISTANCE_METRICS:
+        del matrices[metric]
+        os.replace(os.path.join(directory, f'{metric}.npy.tmp'),
+                   os.path.join(directory, f'{metric}.npy'))
+    np.save(os.path.join(directory, INDEX_FILE), location_ids)
+
+
+class DistanceMatrix:
+    """
+    Pairwise distances between locations, backed by memory-mapped matrices so that lookups only
+    touch the pages they need.
+    """
+
+    def __init__(self, directory: str):
+        self.__directory = directory
+        self.__location_ids = np.load(os.path.join(directory, INDEX_FILE))
+        self.__rows = {location_id: row for row, location_id in enumerate(self.__location_ids.tolist())}
+        self.__matrices = {}
+
+    @property
+    def location_ids(self) -> np.ndarray:
+        return self.__location_ids
+
+    def matrix(self, metric: str = 'LENGTH') -> np.memmap:
+        """
+        Returns the memory-mapped matrix of a metric ('LENGTH' in meters, 'DURATION' in seconds).
+        """
+        if metric not in DISTANCE_METRICS:
+            raise ValueError(f'Unknown metric {metric}, expected one of {DISTANCE_METRICS}')
+        if metric not in self.__matrices:
+            self.__matrices[metric] = np.load(os.path.join(self.__directory, f'{metric}.npy'),
+                                              mmap_mode='r')
+        return self.__matrices[metric]
+
+    def rows(self, location_ids) -> np.ndarray:
+        """
+        Returns the matrix rows of the given LOCATION_IDs.
+        """
+        location_ids = np.asarray(location_ids, dtype=np.int64)
+        rows = np.searchsorted(self.__location_ids, location_ids)
+        rows = np.minimum(rows, self.__location_ids.size - 1)
+        unknown = self.__location_ids[rows] != location_ids
+        if unknown.any():
+            raise KeyError(f'Unknown LOCATION_IDs {np.unique(location_ids[unknown]).tolist()}')
+        return rows
+
+    def distance(self, start_location_id: int, end_location_id: int, metric: str = 'LENGTH') -> float:
+        """
+        Returns the distance between two locations.
+        """
+        return float(self.matrix(metric)[self.__rows[start_location_id], self.__rows[end_location_id]])
+
+    def pairs(self, start_location_ids, end_location_ids, metric: str = 'LENGTH') -> np.ndarray:
+        """
+        Returns the distances between aligned arrays of start and end locations.
+        """
+        return np.asarray(self.matrix(metric)[self.rows(start_location_ids), self.rows(end_location_ids)])
+
+    def submatrix(self, location_ids, metric: str = 'LENGTH') -> pd.DataFrame:
+        """
+        Returns the distances between all given locations, indexed by LOCATION_ID on both axes.
+        """
+        location_ids = np.asarray(location_ids, dtype=np.int64)
+        rows = self.rows(location_ids)
+
+        # Read the rows in storage order to touch every page at most once
+        order = np.argsort(rows, kind='stable')
+        values = np.empty((rows.size, rows.size), dtype=DISTANCE_DTYPE)
+        values[np.ix_(order, order)] = self.matrix(metric)[np.ix_(rows[order], rows[order])]
+
+        return pd.DataFrame(values, index=pd.Index(location_ids, name='START_LOCATION_ID'),
+                            columns=pd.Index(location_ids, name='END_LOCATION_ID'))
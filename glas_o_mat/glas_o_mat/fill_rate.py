@@ -0,0 +1,175 @@
+import numpy as np
+import pandas as pd
+
+NANOSECONDS_PER_DAY = 86_400 * 10 ** 9
+
+
+class FillRates:
+    """
+    Fill rates of the containers per day, one per segment between two emptyings. Rates are in the
+    unit of LEVEL, i.e. cubic metres per day with the VOLUME of the ConstructionTypes.
+    The segments of all containers are stored in contiguous arrays sorted by CONTAINER_ID, the
+    segments of the i-th container are offsets[i]:offsets[i + 1].
+    """
+
+    def __init__(self, container_ids: np.ndarray, offsets: np.ndarray, starts: np.ndarray,
+                 ends: np.ndarray, start_levels: np.ndarray, end_levels: np.ndarray):
+        self.__container_ids = container_ids
+        self.__offsets = offsets
+        self.__starts = starts
+        self.__ends = ends
+        self.__start_levels = start_levels
+        self.__end_levels = end_levels
+
+        self.__days = (ends - starts).astype(np.int64) / NANOSECONDS_PER_DAY
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.__rates = np.where(self.__days > 0, (end_levels - start_levels) / self.__days, np.nan)
+
+    @classmethod
+    def from_frame(cls, aggregated: pd.DataFrame) -> 'FillRates':
+        """
+        Segments the history of every container at its emptyings and calculates the fill rate of
+        every segment. A segment runs from level 0 at an emptying (or the first LEVEL of the
+        container) to the LEVEL read at the next emptying (or the last LEVEL of the container).
+
+        Parameters:
+            aggregated (pd.DataFrame): Activities with 'CONTAINER_ID', 'RECORDED_AT', 'IS_EMPTIED'
+                                       and 'LEVEL', e.g. Dataset.aggregated.
+
+        Returns:
+            FillRates: The fill rates of all containers.
+        """
+        container_ids = aggregated['CONTAINER_ID'].to_numpy(dtype=np.int64)
+        recorded_at = aggregated['RECORDED_AT'].to_numpy(dtype='datetime64[ns]')
+        emptied = aggregated['IS_EMPTIED'].to_numpy() == 1
+        levels = aggregated['LEVEL'].to_numpy(dtype=np.float64)
+
+        order = np.lexsort((recorded_at, container_ids))
+        container_ids, recorded_at = container_ids[order], recorded_at[order]
+        emptied, levels = emptied[order], levels[order]
+
+        # A segment starts with the first activity of a container and with every emptying, after
+        # which the container is at level 0. The LEVEL of an emptying is the reading taken before
+        # the container was emptied, so it ends the previous segment.
+        new_container = np.ones(container_ids.size, dtype=bool)
+        new_container[1:] = container_ids[1:] != container_ids[:-1]
+        segment_starts = np.flatnonzero(new_container | emptied)
+        following = np.append(segment_starts, container_ids.size)[1:]
+        continues = following < container_ids.size
+        continues[continues] = ~new_container[following[continues]]
+        segment_ends = np.where(continues, following, following - 1)
+
+        start_levels = np.where(emptied[segment_starts], 0, levels[segment_starts])
+        end_levels = np.where(segment_ends == segment_starts, start_levels, levels[segment_ends])
+
+        container_starts = np.flatnonzero(new_container)
+        offsets = np.searchsorted(segment_starts, np.append(container_starts, container_ids.size))
+
+        return cls(container_ids[container_starts], offsets,
+                   recorded_at[segment_starts], recorded_at[segment_ends], start_levels, end_levels)
+
+    @property
+    def container_ids(self) -> np.ndarray:
+        return self.__container_ids
+
+    @property
+    def offsets(self) -> np.ndarray:
+        return self.__offsets
+
+    @property
+    def starts(self) -> np.ndarray:
+        return self.__starts
+
+    @property
+    def ends(self) -> np.ndarray:
+        return self.__ends
+
+    @property
+    def start_levels(self) -> np.ndarray:
+        return self.__start_levels
+
+    @property
+    def end_levels(self) -> np.ndarray:
+        return self.__end_levels
+
+    @property
+    def rates(self) -> np.ndarray:
+        """
+        Fill rate of every segment per day, NaN for segments with a single activity.
+        """
+        return self.__rates
+
+    @property
+    def days(self) -> np.ndarray:
+        """
+        Duration of every segment in days.
+        """
+        return self.__days
+
+    def __len__(self) -> int:
+        return self.__container_ids.size
+
+    def rows(self, container_ids) -> np.ndarray:
+        """
+        Returns the positions of the given CONTAINER_IDs in container_ids.
+        """
+        container_ids = np.asarray(container_ids, dtype=np.int64)
+        if self.__container_ids.size == 0:
+            if container_ids.size:
+                raise KeyError(f'Unknown CONTAINER_IDs {np.unique(container_ids).tolist()}')
+            return np.zeros(0, dtype=np.int64)
+        rows = np.searchsorted(self.__container_ids, container_ids)
+        rows = np.minimum(rows, self.__container_ids.size - 1)
+        unknown = self.__container_ids[rows] != container_ids
+        if unknown.any():
+            raise KeyError(f'Unknown CONTAINER_IDs {np.unique(container_ids[unknown]).tolist()}')
+        return rows
+
+    def segments(self, container_id: int) -> slice:
+        """
+        Returns the slice of the segments of a container into the segment arrays.
+        """
+        row = self.rows([container_id])[0]
+        return slice(self.__offsets[row], self.__offsets[row + 1])
+
+    def last_segments(self, container_ids) -> np.ndarray:
+        """
+        Returns the positions of the current (last) segment of the given containers.
+        """
+        return self.__offsets[self.rows(container_ids) + 1] - 1
+
+    def mean_rates(self, container_ids=None) -> np.ndarray:
+        """
+        Calculates the mean fill rate of containers, weighting every segment by its duration.
+
+        Parameters:
+            container_ids: CONTAINER_IDs, all containers in the order of container_ids if None.
+
+        Returns:
+            np.ndarray: The mean fill rates per day, NaN for containers without a
+                        segment of more than one activity.
+        """
+        if self.__container_ids.size == 0:
+            rates = np.zeros(0)
+        else:
+            valid = self.__days > 0
+            gains = np.add.reduceat(np.where(valid, self.__end_levels - self.__start_levels, 0),
+                                    self.__offsets[:-1])
+            days = np.add.reduceat(np.where(valid, self.__days, 0), self.__offsets[:-1])
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rates = np.where(days > 0, gains / days, np.nan)
+        return rates if container_ids is None else rates[self.rows(container_ids)]
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Returns the segments as a DataFrame, e.g. for plotting.
+        """
+        return pd.DataFrame({
+            'CONTAINER_ID': np.repeat(self.__container_ids, np.diff(self.__offsets)),
+            'START': self.__starts,
+            'END': self.__ends,
+            'START_LEVEL': self.__start_levels,
+            'END_LEVEL': self.__end_levels,
+            'DAYS': self.__days,
+            'FILL_RATE': self.__rates,
+        })
@@ -0,0 +1,89 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset
+import pyarrow.parquet as pq
+
+# Rows of the activities CSV parsed at once when partitioning
+PARTITION_CHUNK_SIZE = 500_000
+
+# Types of the numeric activity columns in the partitions, all other columns are stored as strings
+PARTITION_DTYPES = {
+    'TRANSACTION_ID': 'int64',
+    'CONTAINER_ID': 'int64',
+    'SLIDER_LEVEL': 'int64',
+    'CV_LEVEL': 'float64',
+    'SENSOR_LEVEL': 'float64',
+    'IS_EMPTIED': 'int64',
+    'LATITUDE': 'float64',
+    'LONGITUDE': 'float64',
+}
+PARTITION_COLUMNS = ['DISPOSITION_AREA_ID', 'MONTH']
+
+
+def disposition_area_ids(container_ids) -> np.ndarray:
+    """
+    Calculates the disposition area from container ids (<disposition area><location><material><2 digits>).
+    """
+    return np.asarray(container_ids, dtype=np.int64) // 10 ** 9
+
+
+def convert_activities_to_partitions(csv_path: str, directory: str, chunksize: int = PARTITION_CHUNK_SIZE):
+    """
+    Writes the activities CSV as Parquet files partitioned by disposition area and month of
+    RECORDED_AT, <directory>/DISPOSITION_AREA_ID=<id>/MONTH=<yyyy-mm>/<chunk>.parquet.
+
+    Parameters:
+        csv_path (str): Path of the activities CSV.
+        directory (str): Directory the partitions are written to, it is replaced.
+        chunksize (int): Number of CSV rows parsed at once.
+    """
+    temporary_directory = f'{directory}.tmp'
+    shutil.rmtree(temporary_directory, ignore_errors=True)
+
+    columns = pd.read_csv(csv_path, nrows=0).columns
+    dtypes = {column: PARTITION_DTYPES.get(column, 'str') for column in columns}
+    for number, chunk in enumerate(pd.read_csv(csv_path, dtype=dtypes, chunksize=chunksize)):
+        chunk['DISPOSITION_AREA_ID'] = disposition_area_ids(chunk['CONTAINER_ID'])
+        chunk['MONTH'] = chunk['RECORDED_AT'].str[:7]
+        pq.write_to_dataset(pa.Table.from_pandas(chunk, preserve_index=False), temporary_directory,
+                            partition_cols=PARTITION_COLUMNS,
+                            basename_template=f'{number}-{{i}}.parquet')
+
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(temporary_directory, exist_ok=True)
+    os.replace(temporary_directory, directory)
+
+
+def read_activity_partitions(directory: str, areas=None, since: pd.Timestamp | None = None,
+                             until: pd.Timestamp | None = None, columns: list[str] | None = None) -> pd.DataFrame:
+    """
+    Reads the activities of the matching partitions only. The months are matched as a whole, the
+    exact bounds of since and until still have to be applied to RECORDED_AT.
+
+    Parameters:
+        directory (str): Directory of the partitions.
+        areas: DISPOSITION_AREA_IDs to read, all if None.
+        since (pd.Timestamp | None): First day to read.
+        until (pd.Timestamp | None): Last day to read.
+        columns (list[str] | None): Columns to read, all if None.
+
+    Returns:
+        pd.DataFrame: The activities in the format of the CSV.
+    """
+    filters = []
+    if areas is not None:
+        filters.append(('DISPOSITION_AREA_ID', 'in', [int(area) for area in areas]))
+    if since is not None:
+        filters.append(('MONTH', '>=', f'{pd.Timestamp(since):%Y-%m}'))
+    if until is not None:
+        filters.append(('MONTH', '<=', f'{pd.Timestamp(until):%Y-%m}'))
+
+    partitioning = pa.dataset.partitioning(
+        pa.schema([('DISPOSITION_AREA_ID', pa.int64()), ('MONTH', pa.string())]), flavor='hive')
+    table = pq.read_table(directory, columns=columns, filters=filters or None, partitioning=partitioning)
+    activities = table.to_pandas()
+    return activities.drop(columns=PARTITION_COLUMNS, errors='ignore')
@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+
+# Radius around a location the population density is averaged over
+DENSITY_RADIUS_METERS = 1000
+
+# Conversion of the radius into degrees, as in population_density.ipynb (1° ≈ 111,139 m)
+METERS_PER_DEGREE = 111_139
+
+
+def read_raster_window(raster_path: str, lat, lon, margin_degrees: float) -> tuple[np.ndarray, tuple]:
+    """
+    Reads the window of the first band of a GeoTIFF in EPSG:4326 (e.g. the WorldPop
+    deu_pd_2020_1km.tif) that covers all points plus a margin. Requires rasterio.
+
+    Parameters:
+        raster_path (str): Path of the GeoTIFF.
+        lat, lon: Latitudes and longitudes of the points in degrees.
+        margin_degrees (float): Margin around the bounding box of the points.
+
+    Returns:
+        tuple[np.ndarray, tuple]: The band, NaN outside the raster and for nodata, and the affine
+                                  transform of the window as (a, b, c, d, e, f).
+    """
+    import rasterio
+    from rasterio.windows import from_bounds
+
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    with rasterio.open(raster_path) as source:
+        if source.crs is not None and source.crs.to_epsg() != 4326:
+            raise ValueError(f'Expected a raster in EPSG:4326, got {source.crs}')
+
+        window = from_bounds(np.nanmin(lon) - margin_degrees, np.nanmin(lat) - margin_degrees,
+                             np.nanmax(lon) + margin_degrees, np.nanmax(lat) + margin_degrees,
+                             transform=source.transform)
+        window = window.round_offsets().round_lengths()
+
+        # Cells outside the raster and nodata cells are masked and become NaN
+        band = source.read(1, window=window, boundless=True, masked=True)
+        transform = source.window_transform(window)
+        return band.astype(float).filled(np.nan), tuple(transform)[:6]
+
+
+def radius_means(band: np.ndarray, transform: tuple, lat, lon,
+                 radius_meters: float = DENSITY_RADIUS_METERS, nodata: float | None = None) -> np.ndarray:
+    """
+    Averages the raster cells whose centre lies within the radius around every point, like
+    rasterstats.zonal_stats on a buffered point, for all points at once.
+
+    Parameters:
+        band (np.ndarray): The raster values.
+        transform (tuple): Affine transform (a, b, c, d, e, f) of a north-up raster in degrees.
+        lat, lon: Latitudes and longitudes of the points in degrees.
+        radius_meters (float): Radius in meters.
+        nodata (float | None): Value of cells without data.
+
+    Returns:
+        np.ndarray: The mean of every point, NaN if no cell with data lies within the radius.
+    """
+    cell_width, _, left, _, cell_height, top = transform
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    radius = radius_meters / METERS_PER_DEGREE
+
+    # Kernel of cell offsets around the cell of a point that can lie within the radius
+    reach_x = int(np.ceil(radius / abs(cell_width))) + 1
+    reach_y = int(np.ceil(radius / abs(cell_height))) + 1
+    offset_rows, offset_cols = np.mgrid[-reach_y:reach_y + 1, -reach_x:reach_x + 1]
+    offset_rows, offset_cols = offset_rows.ravel(), offset_cols.ravel()
+
+    valid = ~(np.isnan(lat) | np.isnan(lon))
+    rows = np.floor((lat[valid] - top) / cell_height).astype(np.int64)[:, None] + offset_rows
+    cols = np.floor((lon[valid] - left) / cell_width).astype(np.int64)[:, None] + offset_cols
+
+    # Mask of the kernel cells whose centre lies within the radius of the point
+    center_y = top + (rows + 0.5) * cell_height
+    center_x = left + (cols + 0.5) * cell_width
+    inside = (center_y - lat[valid, None]) ** 2 + (center_x - lon[valid, None]) ** 2 <= radius ** 2
+    inside &= (rows >= 0) & (rows < band.shape[0]) & (cols >= 0) & (cols < band.shape[1])
+
+    values = band[np.clip(rows, 0, band.shape[0] - 1), np.clip(cols, 0, band.shape[1] - 1)].astype(float)
+    inside &= ~np.isnan(values)
+    if nodata is not None:
+        inside &= values != nodata
+
+    counts = inside.sum(axis=1)
+    with np.errstate(invalid='ignore'):
+        means = np.where(inside, values, 0).sum(axis=1) / counts
+
+    result = np.full(lat.size, np.nan)
+    result[valid] = np.where(counts > 0, means, np.nan)
+    return result
+
+
+def add_population_density(activities: pd.DataFrame, raster_path: str,
+                           radius_meters: float = DENSITY_RADIUS_METERS,
+                           lat_column: str = 'NEW_LAT', lon_column: str = 'NEW_LON') -> pd.DataFrame:
+    """
+    Adds the population density averaged over the radius around the coordinates of every
+    activity. Every distinct coordinate of a location is sampled once and the raster is read
+    once for all of them.
+
+    Parameters:
+        activities (pd.DataFrame): Activities with 'LOCATION_ID' and coordinates.
+        raster_path (str): Path of the population density GeoTIFF (EPSG:4326).
+        radius_meters (float): Radius in meters.
+        lat_column (str): Column of the latitude.
+        lon_column (str): Column of the longitude.
+
+    Returns:
+        pd.DataFrame: The activities with an added column 'POPULATION_DENSITY'.
+    """
+    groups = activities.groupby(['LOCATION_ID', lat_column, lon_column], sort=False, dropna=False)
+    codes = groups.ngroup().to_numpy()
+    coordinates = groups[[lat_column, lon_column]].first()
+    lat = coordinates[lat_column].to_numpy(dtype=float)
+    lon = coordinates[lon_column].to_numpy(dtype=float)
+
+    densities = np.full(len(coordinates), np.nan)
+    if (~np.isnan(lat)).any():
+        band, transform = read_raster_window(raster_path, lat, lon, 2 * radius_meters / METERS_PER_DEGREE)
+        densities = radius_means(band, transform, lat, lon, radius_meters)
+
+    activities = activities.copy()
+    activities['POPULATION_DENSITY'] = densities[codes]
+    return activities
@@ -0,0 +1,114 @@
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from glas_o_mat.fill_rate import FillRates, NANOSECONDS_PER_DAY
+
+# Maximum number of cached (CONTAINER_ID, day) predictions
+PREDICTION_CACHE_SIZE = 100_000
+
+
+class LevelPredictor:
+    """
+    Predicts the fill level of containers by extrapolating the last observed LEVEL with the mean
+    fill rate of the container. The state of every container is precomputed once, predictions
+    are cached per container and day.
+    """
+
+    def __init__(self, aggregated: pd.DataFrame, cache_size: int = PREDICTION_CACHE_SIZE):
+        self.__cache_size = cache_size
+        self.__cache = OrderedDict()
+        self.__build(aggregated)
+
+    def __build(self, aggregated: pd.DataFrame):
+        fill_rates = FillRates.from_frame(aggregated)
+        last = fill_rates.offsets[1:] - 1
+
+        self.__container_ids = fill_rates.container_ids
+        self.__last_recorded = fill_rates.ends[last].astype(np.int64)
+
+        # The current segment of a container emptied by its last activity is still at level 0
+        self.__last_levels = fill_rates.end_levels[last]
+
+        # Containers without a measured rate fill up like the median container
+        rates = fill_rates.mean_rates()
+        known = ~np.isnan(rates)
+        self.__fallback_rate = np.median(rates[known]) if known.any() else 0
+        self.__fallback_ids = set(self.__container_ids[~known].tolist())
+        self.__rates = np.where(known, rates, self.__fallback_rate)
+
+        volumes = aggregated.groupby('CONTAINER_ID')['VOLUME'].last()
+        self.__volumes = volumes.reindex(self.__container_ids).to_numpy(dtype=np.float64)
+
+    @property
+    def container_ids(self) -> np.ndarray:
+        return self.__container_ids
+
+    def update(self, aggregated: pd.DataFrame, container_ids):
+        """
+        Rebuilds the state after new activities arrived and drops the cached predictions of the
+        touched containers, e.g. with the container ids returned by Dataset.ingest. If the median
+        rate changed, the predictions of the containers without a rate of their own are dropped
+        as well.
+
+        Parameters:
+            aggregated (pd.DataFrame): The updated aggregated activities.
+            container_ids: CONTAINER_IDs with new activities.
+        """
+        fallback_rate, fallback_ids = self.__fallback_rate, self.__fallback_ids
+        self.__build(aggregated)
+
+        # A changed median rate changes the predictions of all containers without a rate
+        touched = set(np.asarray(container_ids, dtype=np.int64).tolist())
+        if self.__fallback_rate != fallback_rate:
+            touched |= fallback_ids | self.__fallback_ids
+        for key in [key for key in self.__cache if key[0] in touched]:
+            del self.__cache[key]
+
+    def predict_levels(self, container_ids, at_time) -> np.ndarray:
+        """
+        Predicts the fill levels of a batch of containers on a day.
+
+        Parameters:
+            container_ids: CONTAINER_IDs of the containers.
+            at_time: Time of the prediction, the prediction is made for the start of its day.
+
+        Returns:
+            np.ndarray: The predicted LEVEL of every container, between 0 and its VOLUME. NaN
+                        for containers without activities.
+        """
+        container_ids = np.asarray(container_ids, dtype=np.int64).ravel()
+        day = pd.Timestamp(at_time).normalize().value
+
+        keys = [(container_id, day) for container_id in container_ids.tolist()]
+        levels = np.empty(len(keys), dtype=np.float64)
+        missing = []
+        for position, key in enumerate(keys):
+            level = self.__cache.get(key)
+            if level is None:
+                missing.append(position)
+            else:
+                levels[position] = level
+                self.__cache.move_to_end(key)
+
+        if missing:
+            levels[missing] = self.__predict(container_ids[missing], day)
+            self.__cache.update((keys[position], level) for position, level
+                                in zip(missing, levels[missing].tolist()))
+        while len(self.__cache) > self.__cache_size:
+            self.__cache.popitem(last=False)
+
+        return levels
+
+    def __predict(self, container_ids: np.ndarray, day: int) -> np.ndarray:
+        if self.__container_ids.size == 0:
+            return np.full(container_ids.size, np.nan)
+        rows = np.searchsorted(self.__container_ids, container_ids)
+        rows = np.minimum(rows, self.__container_ids.size - 1)
+        known = self.__container_ids[rows] == container_ids
+
+        # Days since the last activity, a day before it predicts the last observed level
+        days = np.maximum(day - self.__last_recorded[rows], 0) / NANOSECONDS_PER_DAY
+        levels = np.clip(self.__last_levels[rows] + self.__rates[rows] * days, 0, self.__volumes[rows])
+        return np.where(known, levels, np.nan)
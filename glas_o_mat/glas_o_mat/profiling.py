@@ -0,0 +1,293 @@
+from contextlib import contextmanager
+from collections.abc import Iterator
+import functools
+import json
+import threading
+import time
+import tracemalloc
+
+import pandas as pd
+
+# Number of slowest LOCATION_IDs listed in the report
+TOP_LOCATIONS = 10
+
+
+class StageRecord:
+    """
+    Measurements of one run of a stage. rows_in and rows_out can be set inside the stage.
+    """
+
+    def __init__(self, name: str, rows_in: int | None = None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.seconds = None
+        self.allocated_bytes = None
+        self.peak_bytes = None
+        self.child_peak_bytes = 0
+        self.depth = 0
+
+    def to_dict(self) -> dict:
+        return {
+            'stage': self.name,
+            'depth': self.depth,
+            'seconds': self.seconds,
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'allocated_bytes': self.allocated_bytes,
+            'peak_bytes': self.peak_bytes,
+        }
+
+
+class _NullRecord:
+    """
+    Stands in for a StageRecord while profiling is disabled, assignments are ignored.
+    """
+
+    def __setattr__(self, name, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_RECORD = _NullRecord()
+
+
+class Profiler:
+    """
+    Collects the wall time, row counts and memory of the instrumented stages and the time spent
+    per LOCATION_ID in the per-location functions and the shards of clean_coordinates. Memory is
+    measured with tracemalloc, which is process wide: stages running concurrently in threads see
+    each other's allocations.
+    """
+
+    def __init__(self, trace_memory: bool = True):
+        self.__trace_memory = trace_memory
+        self.__records = []
+        self.__location_seconds = {}
+        self.__lock = threading.Lock()
+        self.__local = threading.local()
+
+    @property
+    def records(self) -> list[StageRecord]:
+        return self.__records
+
+    @property
+    def trace_memory(self) -> bool:
+        return self.__trace_memory
+
+    @contextmanager
+    def stage(self, name: str, rows_in: int | None = None) -> Iterator[StageRecord]:
+        stack = self.__stack()
+        record = StageRecord(name, rows_in)
+        record.depth = len(stack)
+
+        if self.__trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1].child_peak_bytes = max(stack[-1].child_peak_bytes, peak)
+            tracemalloc.reset_peak()
+        stack.append(record)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record.seconds = time.perf_counter() - start
+            stack.pop()
+            if self.__trace_memory:
+                after, peak = tracemalloc.get_traced_memory()
+                peak = max(peak, record.child_peak_bytes)
+                record.allocated_bytes = after - current
+                record.peak_bytes = peak - current
+                if stack:
+                    stack[-1].child_peak_bytes = max(stack[-1].child_peak_bytes, peak)
+            with self.__lock:
+                self.__records.append(record)
+
+    def add_stage_time(self, name: str, seconds: float, rows_in: int | None = None,
+                       rows_out: int | None = None):
+        """
+        Records a stage measured elsewhere, e.g. in a worker process. Its memory is unknown.
+        """
+        record = StageRecord(name, rows_in)
+        record.rows_out = rows_out
+        record.seconds = seconds
+        record.depth = len(self.__stack())
+        with self.__lock:
+            self.__records.append(record)
+
+    def add_location_time(self, name: str, location_id, seconds: float):
+        self.add_location_times(name, [location_id], [seconds])
+
+    def add_location_times(self, name: str, location_ids, seconds):
+        with self.__lock:
+            for location_id, location_seconds in zip(location_ids, seconds):
+                key = (name, location_id)
+                self.__location_seconds[key] = self.__location_seconds.get(key, 0) + location_seconds
+
+    def report(self, top_locations: int = TOP_LOCATIONS) -> dict:
+        """
+        Summarizes the measurements.
+
+        Parameters:
+            top_locations (int): Number of slowest LOCATION_IDs to list.
+
+        Returns:
+            dict: 'stages' with every stage run in the order they finished, 'totals' with the
+                  summed time and runs per stage and 'slowest_locations' with the LOCATION_IDs
+                  taking the most time in the per-location functions and the shards of
+                  clean_coordinates.
+        """
+        stages = [record.to_dict() for record in self.__records]
+
+        totals = {}
+        for record in stages:
+            total = totals.setdefault(record['stage'], {'runs': 0, 'seconds': 0.0})
+            total['runs'] += 1
+            total['seconds'] += record['seconds']
+
+        locations = {}
+        for (name, location_id), seconds in self.__location_seconds.items():
+            location = locations.setdefault(location_id, {'seconds': 0.0, 'stages': {}})
+            location['seconds'] += seconds
+            location['stages'][name] = seconds
+        slowest = sorted(locations.items(), key=lambda item: item[1]['seconds'], reverse=True)
+
+        return {
+            'stages': stages,
+            'totals': totals,
+            'slowest_locations': [{'LOCATION_ID': _to_json_value(location_id), **location}
+                                  for location_id, location in slowest[:top_locations]],
+        }
+
+    def to_json(self, path: str | None = None, top_locations: int = TOP_LOCATIONS) -> str:
+        """
+        Serializes the report to JSON and optionally writes it to a file.
+        """
+        report = json.dumps(self.report(top_locations), indent=2)
+        if path is not None:
+            with open(path, 'w') as file:
+                file.write(report)
+        return report
+
+    def __stack(self) -> list[StageRecord]:
+        if not hasattr(self.__local, 'stack'):
+            self.__local.stack = []
+        return self.__local.stack
+
+
+_profiler: Profiler | None = None
+_started_tracemalloc = False
+
+
+def enable(trace_memory: bool = True) -> Profiler:
+    """
+    Starts collecting measurements in a new profiler.
+
+    Parameters:
+        trace_memory (bool): Whether to measure memory with tracemalloc, which slows down
+                             allocations noticeably.
+
+    Returns:
+        Profiler: The active profiler.
+    """
+    global _profiler, _started_tracemalloc
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _started_tracemalloc = True
+    _profiler = Profiler(trace_memory)
+    return _profiler
+
+
+def disable() -> Profiler | None:
+    """
+    Stops collecting measurements.
+
+    Returns:
+        Profiler | None: The profiler that was active.
+    """
+    global _profiler, _started_tracemalloc
+    profiler, _profiler = _profiler, None
+    if _started_tracemalloc:
+        tracemalloc.stop()
+        _started_tracemalloc = False
+    return profiler
+
+
+def active() -> Profiler | None:
+    return _profiler
+
+
+@contextmanager
+def profile(path: str | None = None, trace_memory: bool = True) -> Iterator[Profiler]:
+    """
+    Profiles the enclosed code and writes the JSON report to path afterwards.
+    """
+    profiler = enable(trace_memory)
+    try:
+        yield profiler
+    finally:
+        disable()
+        if path is not None:
+            profiler.to_json(path)
+
+
+def stage(name: str, rows_in: int | None = None):
+    """
+    Context manager measuring a stage, yields a StageRecord on which rows_out can be set.
+    Without an active profiler it does nothing.
+    """
+    if _profiler is None:
+        return _NULL_RECORD
+    return _profiler.stage(name, rows_in)
+
+
+def profiled(name: str):
+    """
+    Decorator measuring every call of a function as a stage. The rows of the first DataFrame
+    argument and of a returned DataFrame are counted.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _profiler is None:
+                return function(*args, **kwargs)
+
+            frame = next((arg for arg in args if isinstance(arg, pd.DataFrame)), None)
+            with _profiler.stage(name, None if frame is None else len(frame)) as record:
+                result = function(*args, **kwargs)
+                if isinstance(result, pd.DataFrame):
+                    record.rows_out = len(result)
+            return result
+        return wrapper
+    return decorator
+
+
+def profiled_location(name: str):
+    """
+    Decorator for functions applied per location group, e.g. with groupby('LOCATION_ID').apply.
+    The time of every call is added to the LOCATION_ID of the group.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(group, *args, **kwargs):
+            if _profiler is None:
+                return function(group, *args, **kwargs)
+
+            start = time.perf_counter()
+            result = function(group, *args, **kwargs)
+            location_id = getattr(group, 'name', None)
+            if location_id is None and 'LOCATION_ID' in group and len(group):
+                location_id = group['LOCATION_ID'].iloc[0]
+            _profiler.add_location_time(name, location_id, time.perf_counter() - start)
+            return result
+        return wrapper
+    return decorator
+
+
+def _to_json_value(value):
+    return value.item() if hasattr(value, 'item') else value
@@ -0,0 +1,287 @@
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from glas_o_mat.asof import AsOfIndex, to_days
+
+# Mean earth radius in meters
+EARTH_RADIUS_METERS = 6_371_008.8
+
+
+def haversine(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """
+    Calculates the great-circle distance between aligned arrays of coordinates.
+
+    Parameters:
+        lat1, lon1: Latitudes and longitudes of the first points in degrees.
+        lat2, lon2: Latitudes and longitudes of the second points in degrees.
+
+    Returns:
+        np.ndarray: The distances in meters, NaN where a coordinate is missing.
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(values, dtype=float))
+                              for values in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.minimum(a, 1)))
+
+
+def to_unit_vectors(lat, lon) -> np.ndarray:
+    """
+    Projects coordinates onto the unit sphere.
+
+    Parameters:
+        lat, lon: Latitudes and longitudes in degrees.
+
+    Returns:
+        np.ndarray: Array of shape (n, 3) with the 3D unit vectors.
+    """
+    lat = np.radians(np.asarray(lat, dtype=float))
+    lon = np.radians(np.asarray(lon, dtype=float))
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+
+def chord_to_meters(chord) -> np.ndarray:
+    """
+    Converts chord lengths on the unit sphere into great-circle distances in meters.
+    """
+    return 2 * EARTH_RADIUS_METERS * np.arcsin(np.minimum(np.asarray(chord, dtype=float) / 2, 1))
+
+
+def meters_to_chord(meters) -> np.ndarray:
+    """
+    Converts great-circle distances in meters into chord lengths on the unit sphere.
+    """
+    return 2 * np.sin(np.minimum(np.asarray(meters, dtype=float) / (2 * EARTH_RADIUS_METERS), np.pi / 2))
+
+
+class LocationIndex:
+    """
+    KD-tree over location coordinates on the unit sphere, for batch nearest-neighbour queries.
+    A LOCATION_ID may occur several times, e.g. once per validity period of its coordinates.
+    """
+
+    def __init__(self, location_ids, lat, lon):
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        valid = ~(np.isnan(lat) | np.isnan(lon))
+
+        self.__location_ids = np.asarray(location_ids)[valid]
+        self.__tree = cKDTree(to_unit_vectors(lat[valid], lon[valid]))
+
+    @classmethod
+    def from_frame(cls, locations: pd.DataFrame, lat_column: str = 'GEO_LAT',
+                   lon_column: str = 'GEO_LON') -> 'LocationIndex':
+        """
+        Builds the index from a locations frame, e.g. Dataset.locations.
+        """
+        return cls(locations['LOCATION_ID'].to_numpy(), locations[lat_column].to_numpy(),
+                   locations[lon_column].to_numpy())
+
+    @property
+    def location_ids(self) -> np.ndarray:
+        return self.__location_ids
+
+    @property
+    def tree(self) -> cKDTree:
+        return self.__tree
+
+    def query(self, lat, lon, k: int = 1) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the k nearest indexed locations of every point.
+
+        Parameters:
+            lat, lon: Latitudes and longitudes of the query points in degrees.
+            k (int): Number of neighbours.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The distances in meters and the LOCATION_IDs, of shape
+                                           (n,) for k=1 and (n, k) otherwise. Points without
+                                           coordinates get the distance inf.
+        """
+        points = to_unit_vectors(np.atleast_1d(lat), np.atleast_1d(lon))
+        valid = np.isfinite(points).all(axis=1)
+        shape = (len(points),) if k == 1 else (len(points), k)
+        distances = np.full(shape, np.inf)
+        positions = np.full(shape, self.__tree.n)
+        if valid.any():
+            distances[valid], positions[valid] = self.__tree.query(points[valid], k=k)
+
+        # Missing neighbours (no coordinates or fewer than k indexed locations) have distance inf
+        found = positions < self.__tree.n
+        location_ids = np.zeros(shape, dtype=self.__location_ids.dtype)
+        location_ids[found] = self.__location_ids[positions[found]]
+        return np.where(found, chord_to_meters(distances), np.inf), location_ids
+
+    def within(self, lat, lon, radius_meters) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Finds all indexed locations within a radius of every point, in one tree query.
+
+        Parameters:
+            lat, lon: Latitudes and longitudes of the query points in degrees.
+            radius_meters: Radius in meters, a scalar or one per point.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Aligned arrays with the position of the query point and
+                                           the LOCATION_ID of every match. Points without
+                                           coordinates have no matches.
+        """
+        points = to_unit_vectors(np.atleast_1d(lat), np.atleast_1d(lon))
+        radii = np.broadcast_to(meters_to_chord(radius_meters), len(points))
+        valid = np.flatnonzero(np.isfinite(points).all(axis=1) & np.isfinite(radii))
+        if valid.size == 0 or self.__tree.n == 0:
+            return np.zeros(0, dtype=np.int64), self.__location_ids[:0]
+
+        matches = self.__tree.query_ball_point(points[valid], r=radii[valid])
+        counts = np.fromiter((len(match) for match in matches), dtype=np.int64, count=len(matches))
+        positions = np.concatenate(matches).astype(np.int64) if counts.sum() else np.zeros(0, dtype=np.int64)
+        return np.repeat(valid, counts), self.__location_ids[positions]
+
+    def nearest_other(self, location_ids, lat, lon) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the nearest indexed location with a different LOCATION_ID for every point.
+
+        Parameters:
+            location_ids: LOCATION_IDs of the query points.
+            lat, lon: Latitudes and longitudes of the query points in degrees.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The distances in meters (inf if there is none or the
+                                           point has no coordinates) and the nearest other
+                                           LOCATION_IDs.
+        """
+        location_ids = np.asarray(location_ids)
+
+        # Among the k nearest points there is always one of another location
+        _, counts = np.unique(self.__location_ids, return_counts=True)
+        k = int(min(counts.max(initial=0) + 1, self.__tree.n))
+        if k == 0:
+            return np.full(location_ids.size, np.inf), np.zeros(location_ids.size, dtype=self.__location_ids.dtype)
+
+        points = to_unit_vectors(np.atleast_1d(lat), np.atleast_1d(lon))
+        valid = np.isfinite(points).all(axis=1)
+        chord = np.full((len(location_ids), k), np.inf)
+        positions = np.full((len(location_ids), k), self.__tree.n)
+        if valid.any():
+            chord[valid], positions[valid] = (values.reshape(-1, k) for values in
+                                              self.__tree.query(points[valid], k=k))
+        neighbours = self.__location_ids[np.minimum(positions, self.__tree.n - 1)]
+
+        other = (neighbours != location_ids[:, None]) & (positions < self.__tree.n)
+        first = np.argmax(other, axis=1)
+        rows = np.arange(len(location_ids))
+        distances = np.where(other[rows, first], chord_to_meters(chord[rows, first]), np.inf)
+        return distances, neighbours[rows, first]
+
+
+def nearest_locations(locations: pd.DataFrame, lat_column: str = 'GEO_LAT',
+                      lon_column: str = 'GEO_LON') -> pd.DataFrame:
+    """
+    Finds the nearest other location of every location.
+
+    Parameters:
+        locations (pd.DataFrame): Locations with 'LOCATION_ID' and coordinates.
+        lat_column (str): Column of the latitude.
+        lon_column (str): Column of the longitude.
+
+    Returns:
+        pd.DataFrame: The locations with added columns 'NEAREST_LOCATION_ID' and 'DISTANCE_METERS'.
+    """
+    index = LocationIndex.from_frame(locations, lat_column, lon_column)
+    distances, nearest = index.nearest_other(locations['LOCATION_ID'].to_numpy(),
+                                             locations[lat_column].to_numpy(),
+                                             locations[lon_column].to_numpy())
+
+    locations = locations.copy()
+    locations['NEAREST_LOCATION_ID'] = nearest
+    locations['DISTANCE_METERS'] = distances
+    locations.loc[locations[[lat_column, lon_column]].isna().any(axis=1),
+                  ['NEAREST_LOCATION_ID', 'DISTANCE_METERS']] = np.nan
+    return locations
+
+
+def add_location_distances(activities: pd.DataFrame, locations: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds the registered coordinates of every activity, the distance between the scan and the
+    registered location and the nearest other location.
+
+    Parameters:
+        activities (pd.DataFrame): Activities with 'LOCATION_ID', 'LATITUDE' and 'LONGITUDE'.
+        locations (pd.DataFrame): Locations with 'LOCATION_ID', 'GEO_LAT' and 'GEO_LON'.
+
+    Returns:
+        pd.DataFrame: The activities with added columns 'GEO_LAT', 'GEO_LON', 'DISTANCE',
+                      'NEAREST_LOCATION_ID' and 'DISTANCE_METERS'.
+    """
+    nearest = nearest_locations(locations.drop_duplicates('LOCATION_ID'))
+    nearest = nearest.set_index('LOCATION_ID')[['GEO_LAT', 'GEO_LON', 'NEAREST_LOCATION_ID', 'DISTANCE_METERS']]
+
+    activities = activities.drop(columns=nearest.columns, errors='ignore')
+    activities = activities.join(nearest, on='LOCATION_ID')
+    activities['DISTANCE'] = haversine(activities['LATITUDE'], activities['LONGITUDE'],
+                                       activities['GEO_LAT'], activities['GEO_LON'])
+    return activities
+
+
+class CoordinateHistory:
+    """
+    As-of lookups of time-versioned location coordinates (Locations_cleaned.csv). The periods
+    are sorted once, every batch of lookups is answered by a binary search, so joining n
+    activities to m periods costs O(n log m).
+    """
+
+    def __init__(self, versioned: pd.DataFrame):
+        versioned = versioned.sort_values(['LOCATION_ID', 'START_DATUM'], kind='mergesort')
+
+        location_ids = versioned['LOCATION_ID'].to_numpy(dtype=np.int64)
+        self.__locations = pd.Index(np.unique(location_ids))
+        self.__index = AsOfIndex(self.__locations.get_indexer(location_ids), to_days(versioned['START_DATUM']))
+        self.__ends = to_days(versioned['END_DATUM'])
+        self.__lat = versioned['LAT'].to_numpy(dtype=float)
+        self.__lon = versioned['LONG'].to_numpy(dtype=float)
+
+    def at(self, location_ids, dates, strict: bool = False) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Looks up the coordinates valid for aligned arrays of locations and dates. A period is
+        valid from its START_DATUM until the next period of the location starts.
+
+        Parameters:
+            location_ids: LOCATION_IDs of the lookups.
+            dates: Dates of the lookups.
+            strict (bool): Only use a period until its END_DATUM, dates in the gap to the next
+                           period get no coordinates.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Latitudes and longitudes, NaN for unknown locations and
+                                           dates before the first period.
+        """
+        days = to_days(np.atleast_1d(dates))
+        if len(self.__index) == 0:
+            return np.full(days.size, np.nan), np.full(days.size, np.nan)
+        codes = self.__locations.get_indexer(np.atleast_1d(location_ids).astype(np.int64))
+
+        positions, found = self.__index.lookup(codes, days)
+        if strict:
+            found &= days <= self.__ends[positions]
+        return np.where(found, self.__lat[positions], np.nan), np.where(found, self.__lon[positions], np.nan)
+
+
+def add_versioned_coordinates(activities: pd.DataFrame, versioned: pd.DataFrame,
+                              strict: bool = False) -> pd.DataFrame:
+    """
+    Adds the location coordinates valid at the time of every activity.
+
+    Parameters:
+        activities (pd.DataFrame): Activities with 'LOCATION_ID' and 'RECORDED_AT'.
+        versioned (pd.DataFrame): Periods with 'LOCATION_ID', 'START_DATUM', 'END_DATUM', 'LAT'
+                                  and 'LONG', e.g. Locations_cleaned.csv.
+        strict (bool): See CoordinateHistory.at.
+
+    Returns:
+        pd.DataFrame: The activities with added columns 'LOCATION_LAT' and 'LOCATION_LON'.
+    """
+    lat, lon = CoordinateHistory(versioned).at(activities['LOCATION_ID'].to_numpy(),
+                                               activities['RECORDED_AT'].to_numpy(), strict)
+    activities = activities.copy()
+    activities['LOCATION_LAT'] = lat
+    activities['LOCATION_LON'] = lon
+    return activities
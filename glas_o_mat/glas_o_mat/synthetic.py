@@ -0,0 +1,255 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from glas_o_mat.dataset import ACTIVITIES_FILE, CONTAINERS_FILE, LOCATIONS_FILE, CONSTRUCTION_TYPES_FILE
+
+# Size of the sample data, a fleet of scale 1 has about as many locations and activities
+SAMPLE_LOCATIONS = 400
+SAMPLE_DAYS = 150
+
+# Bounding box of the generated locations (around Kaiserslautern)
+LAT_RANGE = (49.30, 49.60)
+LON_RANGE = (7.60, 8.00)
+METERS_PER_DEGREE_LAT = 111_320
+
+# Materials (white, green, brown) and the probability of a location to have a container of it
+MATERIAL_TYPE_IDS = (11, 12, 13)
+MATERIAL_PROBABILITY = 0.9
+
+# Days between two visits of a location and the slider level a container is emptied at
+VISIT_INTERVAL_DAYS = (14, 56)
+EMPTYING_LEVEL = 70
+
+# GPS noise of the phones in meters, share of locations with a temporary shift and of outliers
+GPS_JITTER_METERS = 5
+SHIFT_PROBABILITY = 0.2
+SHIFT_METERS = (40, 300)
+SHIFT_VISITS = (3, 8)
+OUTLIER_PROBABILITY = 0.01
+OUTLIER_METERS = (500, 3000)
+
+# Share of activities scanned twice on the same day and recorded by a test phone
+RESCAN_PROBABILITY = 0.01
+TEST_PHONE_PROBABILITY = 0.005
+
+CONSTRUCTION_TYPES = pd.DataFrame({
+    'CONSTRUCTION_TYPE_ID': [1, 2, 3, 4],
+    'CONSTRUCTION_TYPE_NAME': ['Depotcontainer 3,2', 'Depotcontainer 1,6', 'Depotcontainer 2-Kammer 1,6',
+                               'Depotcontainer 3,6'],
+    'VOLUME': [3.2, 1.6, 1.6, 3.6],
+    'HEIGHT': [1000.0, 1000.0, 1000.0, 1200.0],
+    'LENGTH': -1.0,
+    'WIDTH': -1.0,
+    'SLOT_HEIGHT': -1.0,
+    'HAS_FLAP': [1, 1, -1, -1],
+    'OPENING_MECHANISM': 'Grumbach',
+    'NUM_OPENING_HOLES_PER_COMPARTMENT': 2,
+    'NUM_COMPARTMENTS': [1, 1, 2, 1],
+})
+CONSTRUCTION_TYPE_WEIGHTS = (0.7, 0.1, 0.05, 0.15)
+
+
+def generate_fleet(num_locations: int = SAMPLE_LOCATIONS, num_days: int = SAMPLE_DAYS,
+                   start: str = '2024-07-01', seed: int = 0) -> dict[str, pd.DataFrame]:
+    """
+    Generates a synthetic fleet in the format of the data folder. Every location is visited in
+    a fixed interval, the containers fill up at a constant rate with some noise and are emptied
+    when they reach EMPTYING_LEVEL. The scans have GPS jitter, some locations a temporary shift
+    and some scans are outliers.
+
+    Parameters:
+        num_locations (int): Number of locations.
+        num_days (int): Number of days with activities.
+        start (str): Day of the first activity.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        dict[str, pd.DataFrame]: The frames by file name, see write_fleet.
+    """
+    rng = np.random.default_rng(seed)
+    locations = _generate_locations(rng, num_locations)
+    containers = _generate_containers(rng, locations['LOCATION_ID'].to_numpy())
+    activities = _generate_activities(rng, locations, containers, num_days, pd.Timestamp(start))
+
+    return {
+        ACTIVITIES_FILE: activities,
+        CONTAINERS_FILE: containers,
+        LOCATIONS_FILE: locations,
+        CONSTRUCTION_TYPES_FILE: CONSTRUCTION_TYPES.copy(),
+    }
+
+
+def write_fleet(path: str, scale: float = 1, seed: int = 0) -> dict[str, pd.DataFrame]:
+    """
+    Generates a synthetic fleet of scale times the sample locations and writes it to a data
+    folder, which can be loaded with Dataset(path).
+
+    Parameters:
+        path (str): Directory the CSV files are written to.
+        scale (float): Number of locations relative to the sample data.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        dict[str, pd.DataFrame]: The written frames by file name.
+    """
+    fleet = generate_fleet(int(SAMPLE_LOCATIONS * scale), seed=seed)
+
+    os.makedirs(path, exist_ok=True)
+    for file_name, frame in fleet.items():
+        frame.to_csv(os.path.join(path, file_name), index=False)
+    return fleet
+
+
+def _generate_locations(rng: np.random.Generator, num_locations: int) -> pd.DataFrame:
+    # 15 digit ids: 10 digits of the disposition area and a 5 digit number
+    areas = np.sort(1001101101 + rng.integers(0, max(num_locations // 100, 1), num_locations))
+    location_ids = areas * 100_000 + np.arange(1, num_locations + 1)
+
+    return pd.DataFrame({
+        'LOCATION_ID': location_ids,
+        'GEO_LAT': np.round(rng.uniform(*LAT_RANGE, num_locations), 6),
+        'GEO_LON': np.round(rng.uniform(*LON_RANGE, num_locations), 6),
+        'LOCATION_NAME': [f'Standort {number}' for number in range(1, num_locations + 1)],
+        'CITY': 'Kaiserslautern',
+        'STREET': [f'Musterstraße {number}' for number in range(1, num_locations + 1)],
+        'POSTALCODE': 67655,
+        'IS_ACTIVE': 1,
+        'DISPOSITION_AREA_ID': areas,
+        'ACCESS_TYPE': 'public',
+        'HAS_POSITION_CHANGED': 0,
+    })
+
+
+def _generate_containers(rng: np.random.Generator, location_ids: np.ndarray) -> pd.DataFrame:
+    # Every location has at least one container
+    present = rng.random((location_ids.size, len(MATERIAL_TYPE_IDS))) < MATERIAL_PROBABILITY
+    present[np.arange(location_ids.size), rng.integers(0, len(MATERIAL_TYPE_IDS), location_ids.size)] = True
+    locations, materials = np.nonzero(present)
+
+    material_ids = np.asarray(MATERIAL_TYPE_IDS)[materials]
+    return pd.DataFrame({
+        'CONTAINER_ID': location_ids[locations] * 10_000 + material_ids * 100 + 11,
+        'LOCATION_ID': location_ids[locations],
+        'MATERIAL_TYPE_ID': material_ids,
+        'CONSTRUCTION_TYPE_ID': rng.choice(CONSTRUCTION_TYPES['CONSTRUCTION_TYPE_ID'], locations.size,
+                                           p=CONSTRUCTION_TYPE_WEIGHTS),
+        'IS_ACTIVE': 1,
+        'added_at': '2024-01-01 00:00:00.0',
+        'IS_AUTOMATICALLY_GENERATED': 0,
+        'IS_CONFIRMED': 1,
+    })
+
+
+def _generate_activities(rng: np.random.Generator, locations: pd.DataFrame, containers: pd.DataFrame,
+                         num_days: int, start: pd.Timestamp) -> pd.DataFrame:
+    num_locations = len(locations)
+
+    # Visits: every location is visited in a fixed interval starting at a random day
+    intervals = rng.integers(*VISIT_INTERVAL_DAYS, num_locations, endpoint=True)
+    phases = (rng.random(num_locations) * intervals).astype(np.int64)
+    visit_counts = np.maximum(-(-(num_days - phases) // intervals), 0)
+    visit_locations = np.repeat(np.arange(num_locations), visit_counts)
+    visit_numbers = np.arange(visit_locations.size) - np.repeat(np.cumsum(visit_counts) - visit_counts,
+                                                                visit_counts)
+    visit_days = phases[visit_locations] + visit_numbers * intervals[visit_locations]
+    visit_times = (start.value + visit_days * 86_400 * 10 ** 9
+                   + rng.integers(6 * 3600, 14 * 3600, visit_locations.size) * 10 ** 9)
+
+    # Phone coordinates of every visit, shared by all containers of the location
+    lat, lon = _visit_coordinates(rng, locations, visit_locations, visit_numbers, visit_counts)
+
+    # Activities: all containers of the location are scanned a few seconds apart
+    container_locations = np.searchsorted(locations['LOCATION_ID'].to_numpy(),
+                                          containers['LOCATION_ID'].to_numpy())
+    order = np.argsort(container_locations, kind='stable')
+    per_location = np.bincount(container_locations, minlength=num_locations)
+    first_container = np.cumsum(per_location) - per_location
+
+    visits = np.repeat(np.arange(visit_locations.size), per_location[visit_locations])
+    slot = np.arange(visits.size) - np.repeat(np.cumsum(per_location[visit_locations])
+                                              - per_location[visit_locations], per_location[visit_locations])
+    container_rows = order[first_container[visit_locations[visits]] + slot]
+
+    # Emptying cycles: a container is emptied every cycle visits once it reached EMPTYING_LEVEL
+    fill_per_visit = rng.lognormal(np.log(15), 0.5, len(containers)) \
+        * intervals[container_locations] / 30
+    cycles = np.maximum(np.ceil(EMPTYING_LEVEL / fill_per_visit), 1).astype(np.int64)
+    offsets = rng.integers(0, cycles)
+    position = (visit_numbers[visits] + offsets[container_rows]) % cycles[container_rows]
+    levels = fill_per_visit[container_rows] * (position + 1) + rng.normal(0, 5, visits.size)
+    slider_levels = np.clip(np.round(levels / 10) * 10, 0, 100).astype(np.int64)
+    emptied = (position == cycles[container_rows] - 1).astype(np.int64)
+
+    recorded_at = visit_times[visits] + slot * rng.integers(5, 20, visits.size) * 10 ** 9
+
+    # Rescans on the same day
+    rescans = np.flatnonzero(rng.random(visits.size) < RESCAN_PROBABILITY)
+    rows = np.concatenate([np.arange(visits.size), rescans])
+    recorded_at = np.concatenate([recorded_at, recorded_at[rescans] + 300 * 10 ** 9])
+
+    container_ids = containers['CONTAINER_ID'].to_numpy()[container_rows[rows]]
+    recorded_at = pd.to_datetime(recorded_at)
+    areas = locations['DISPOSITION_AREA_ID'].to_numpy()[visit_locations[visits[rows]]]
+    # One phone per disposition area, a few scans come from test phones
+    area_ids, area_codes = np.unique(areas, return_inverse=True)
+    phones = np.array([f'UP1A.231005.007_{area:016x}' for area in area_ids.tolist()])[area_codes]
+    phones = np.where(rng.random(rows.size) < TEST_PHONE_PROBABILITY, 'TKQ1.221114.001_0000000000000000',
+                      phones)
+
+    activities = pd.DataFrame({
+        'CONTAINER_ID': container_ids,
+        'SLIDER_LEVEL': slider_levels[rows],
+        'CV_LEVEL': np.nan,
+        'SENSOR_LEVEL': np.nan,
+        'IMAGE_ID': pd.Series(container_ids).astype(str) + '/'
+                    + recorded_at.strftime('%Y-%m-%dT%H:%M:%S.000000') + '.png',
+        'PHONE_ID': phones,
+        'RECORDED_AT': recorded_at.strftime('%Y-%m-%d %H:%M:%S.0'),
+        'COMMENT': np.nan,
+        'IS_EMPTIED': emptied[rows],
+        'LATITUDE': np.round(lat[visits[rows]], 6),
+        'LONGITUDE': np.round(lon[visits[rows]], 6),
+        'CREATED_AT': (recorded_at - pd.Timedelta(hours=2)).strftime('%Y-%m-%d %H:%M:%S.0'),
+        'UPDATED_AT': (recorded_at - pd.Timedelta(hours=2)).strftime('%Y-%m-%d %H:%M:%S.0'),
+        'ROUTE_ID': recorded_at.strftime('%Y-%m-%d') + '-' + pd.Series(areas).astype(str) + '-0',
+    })
+
+    # Transactions are numbered in the order the scans were recorded
+    activities = activities.iloc[np.argsort(recorded_at.to_numpy(), kind='stable')]
+    activities.insert(0, 'TRANSACTION_ID', np.arange(1, len(activities) + 1))
+    return activities.reset_index(drop=True)
+
+
+def _visit_coordinates(rng: np.random.Generator, locations: pd.DataFrame, visit_locations: np.ndarray,
+                       visit_numbers: np.ndarray, visit_counts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    num_locations = len(locations)
+    geo_lat = locations['GEO_LAT'].to_numpy()[visit_locations]
+    geo_lon = locations['GEO_LON'].to_numpy()[visit_locations]
+
+    # GPS jitter of every scan
+    north = rng.normal(0, GPS_JITTER_METERS, visit_locations.size)
+    east = rng.normal(0, GPS_JITTER_METERS, visit_locations.size)
+
+    # Temporary shifts: a few consecutive visits of a location are scanned somewhere else
+    shifted = rng.random(num_locations) < SHIFT_PROBABILITY
+    shift_start = (rng.random(num_locations) * np.maximum(visit_counts - SHIFT_VISITS[0], 0)).astype(np.int64)
+    shift_end = shift_start + rng.integers(*SHIFT_VISITS, num_locations, endpoint=True)
+    shift_distance = rng.uniform(*SHIFT_METERS, num_locations)
+    shift_angle = rng.uniform(0, 2 * np.pi, num_locations)
+    in_shift = (shifted[visit_locations] & (visit_numbers >= shift_start[visit_locations])
+                & (visit_numbers < shift_end[visit_locations]))
+    north += np.where(in_shift, (shift_distance * np.sin(shift_angle))[visit_locations], 0)
+    east += np.where(in_shift, (shift_distance * np.cos(shift_angle))[visit_locations], 0)
+
+    # Outliers: single scans far away from the location
+    outlier = rng.random(visit_locations.size) < OUTLIER_PROBABILITY
+    outlier_distance = rng.uniform(*OUTLIER_METERS, visit_locations.size)
+    outlier_angle = rng.uniform(0, 2 * np.pi, visit_locations.size)
+    north += np.where(outlier, outlier_distance * np.sin(outlier_angle), 0)
+    east += np.where(outlier, outlier_distance * np.cos(outlier_angle), 0)
+
+    lat = geo_lat + north / METERS_PER_DEGREE_LAT
+    lon = geo_lon + east / (METERS_PER_DEGREE_LAT * np.cos(np.radians(geo_lat)))
+    return lat, lon
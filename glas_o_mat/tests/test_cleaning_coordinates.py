@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from glas_o_mat import cleaning_coordinates, profiling
+from glas_o_mat.dataset import ACTIVITIES_FILE, LOCATIONS_FILE
+from glas_o_mat.spatial import add_location_distances
+from glas_o_mat.synthetic import generate_fleet
+
+# The reference implementations apply per location on the grouping columns
+pytestmark = pytest.mark.filterwarnings('ignore:DataFrameGroupBy.apply operated on the grouping columns')
+
+
+def test_versioned_coordinates_are_days():
+    cleaned = pd.DataFrame({
+        'LOCATION_ID': [1, 1, 1],
+        'RECORDED_DATE': ['2024-01-01 08:15:00', '2024-01-02 17:40:00', '2024-01-05 06:00:00'],
+        'NEW_LAT': [47.1, 47.1, 47.2],
+        'NEW_LON': [8.1, 8.1, 8.2],
+    })
+
+    periods = cleaning_coordinates.versioned_coordinates(cleaned)
+
+    assert periods['START_DATUM'].tolist() == list(pd.to_datetime(['2024-01-01', '2024-01-05']))
+    assert periods['END_DATUM'].tolist() == list(pd.to_datetime(['2024-01-02', '2024-01-05']))
+
+
+@pytest.fixture(scope='module')
+def coordinates() -> pd.DataFrame:
+    # One scan per location and day of a small synthetic fleet, in shuffled order
+    fleet = generate_fleet(num_locations=60, seed=1)
+    activities = fleet[ACTIVITIES_FILE]
+    activities['LOCATION_ID'] = activities['CONTAINER_ID'] // 10_000
+    activities['RECORDED_DATE'] = pd.to_datetime(activities['RECORDED_AT']).dt.normalize()
+
+    activities = add_location_distances(activities, fleet[LOCATIONS_FILE])
+    activities = activities.drop_duplicates(subset=['LOCATION_ID', 'RECORDED_DATE'])
+    activities = activities[cleaning_coordinates.PIPELINE_COLUMNS].reset_index(drop=True)
+    return activities.sample(frac=1, random_state=0)
+
+
+def test_outlier_classification_matches_reference(coordinates):
+    reference = coordinates.groupby('LOCATION_ID', group_keys=False) \
+        .apply(cleaning_coordinates.outlier_classification)
+    vectorized = cleaning_coordinates.outlier_classification_vectorized(coordinates)
+
+    assert vectorized['OUTLIER'].any()
+    pd.testing.assert_frame_equal(reference.sort_index(), vectorized.sort_index())
+
+
+def test_temporary_shifts_match_reference(coordinates):
+    classified = cleaning_coordinates.outlier_classification_vectorized(coordinates) \
+        .sample(frac=1, random_state=1)
+    reference = cleaning_coordinates.detect_temporary_shifts(classified.copy())
+    vectorized = cleaning_coordinates.detect_temporary_shifts_vectorized(classified)
+
+    assert (vectorized['CLASSIFICATION'] == 'temporary_shift').any()
+    pd.testing.assert_frame_equal(reference, vectorized)
+
+
+def test_coordinate_update_matches_reference(coordinates):
+    shifted = cleaning_coordinates.detect_temporary_shifts_vectorized(
+        cleaning_coordinates.outlier_classification_vectorized(coordinates)).sample(frac=1, random_state=1)
+    reference = cleaning_coordinates.update_coordinates_with_outliers(shifted.copy())
+    vectorized = cleaning_coordinates.update_coordinates_with_outliers_vectorized(shifted)
+
+    pd.testing.assert_frame_equal(reference, vectorized)
+
+
+def test_clean_coordinates_matches_stages(coordinates):
+    stages = cleaning_coordinates.update_coordinates_with_outliers_vectorized(
+        cleaning_coordinates.detect_temporary_shifts_vectorized(
+            cleaning_coordinates.outlier_classification_vectorized(coordinates)))
+    cleaned = cleaning_coordinates.clean_coordinates(coordinates, max_workers=1)
+
+    columns = ['CLASSIFICATION', 'OUTLIER', 'NEW_LAT', 'NEW_LON']
+    pd.testing.assert_frame_equal(stages.loc[cleaned.index, columns], cleaned[columns])
+
+
+def test_cached_cleaning_matches_clean_coordinates(coordinates, tmp_path, monkeypatch):
+    clean_coordinates = cleaning_coordinates.clean_coordinates
+    computed_rows = []
+
+    def counting_clean_coordinates(df, *args):
+        computed_rows.append(len(df))
+        return clean_coordinates(df, *args)
+
+    def check(df):
+        computed_rows.clear()
+        cached = cleaning_coordinates.clean_coordinates_cached(df, str(tmp_path), max_workers=1)
+        pd.testing.assert_frame_equal(cached, clean_coordinates(df, max_workers=1))
+        return sum(computed_rows)
+
+    monkeypatch.setattr(cleaning_coordinates, 'clean_coordinates', counting_clean_coordinates)
+    assert check(coordinates) == len(coordinates)
+
+    # A warm run recomputes nothing
+    assert check(coordinates) == 0
+
+    # Only the changed location is recomputed, also when the locations are shuffled (the order of
+    # the rows within a location is part of its hash)
+    shuffled = coordinates['LOCATION_ID'].drop_duplicates().sample(frac=1, random_state=2)
+    ranks = pd.Series(np.arange(len(shuffled)), index=shuffled.to_numpy())
+    changed = coordinates.iloc[np.argsort(ranks[coordinates['LOCATION_ID']].to_numpy(), kind='stable')].copy()
+    location = changed['LOCATION_ID'].iloc[0]
+    in_location = changed['LOCATION_ID'] == location
+    changed.loc[changed.index[in_location][0], 'DISTANCE'] += 500
+    assert check(changed) == in_location.sum()
+
+    # A subset of the locations is served from the cache, the other locations stay cached
+    subset = coordinates[coordinates['LOCATION_ID'].isin(coordinates['LOCATION_ID'].unique()[:10])]
+    assert check(subset) == 0
+    assert check(coordinates) == in_location.sum()
+
+    # A changed constant discards the whole cache
+    monkeypatch.setattr(cleaning_coordinates, 'HARD_OUTLIER_THRESHOLD', 200)
+    assert check(coordinates) == len(coordinates)
+
+
+@pytest.mark.parametrize('max_workers', [1, 2])
+def test_clean_coordinates_profiles_locations(coordinates, max_workers):
+    with profiling.profile(trace_memory=False) as profiler:
+        cleaning_coordinates.clean_coordinates(coordinates, max_workers=max_workers)
+    report = profiler.report(top_locations=len(coordinates))
+
+    stages = [name for name, _ in cleaning_coordinates.SHARD_STAGES]
+    assert all(report['totals'][name]['runs'] == max_workers for name in stages)
+    assert {location['LOCATION_ID'] for location in report['slowest_locations']} == \
+        set(coordinates['LOCATION_ID'].tolist())
+    assert all(set(location['stages']) == set(stages) for location in report['slowest_locations'])
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+from glas_o_mat.container_count import ContainerCounts, container_count_history
+
+HISTORY = pd.DataFrame({
+    'LOCATION_ID': [1, 1, 2],
+    'MATERIAL_TYPE_ID': [1, 1, 1],
+    'START_DATE': pd.to_datetime(['2024-03-01', '2024-04-01', '2024-01-01']),
+    'END_DATE': pd.to_datetime(['2024-03-15', pd.NaT, '2024-06-30']),
+    'NUM_CONTAINERS': [1, 3, 2],
+})
+
+
+def test_container_counts_as_of():
+    counts = ContainerCounts(HISTORY).at([1, 1, 1, 2, 2, 3], [1, 1, 1, 1, 1, 1], pd.to_datetime(
+        ['2024-03-10', '2024-03-20', '2025-01-01', '2024-06-30', '2024-07-01', '2024-03-10']))
+
+    np.testing.assert_array_equal(counts, [1, 0, 3, 2, 0, 0])
+
+
+def test_container_counts_before_first_interval():
+    counts = ContainerCounts(HISTORY).at([1, 2], [1, 1], pd.to_datetime(['2024-02-01', '2023-12-31']))
+
+    np.testing.assert_array_equal(counts, [0, 0])
+
+
+def test_container_count_history_matches_daily_counts():
+    activities = pd.DataFrame({
+        'LOCATION_ID': [1, 1, 1, 1],
+        'MATERIAL_ID': [1, 1, 1, 1],
+        'CONTAINER_ID': [10, 10, 11, 11],
+        'DATE': pd.to_datetime(['2024-01-01', '2024-01-05', '2024-01-03', '2024-01-08']),
+    })
+    counts = ContainerCounts(container_count_history(activities))
+
+    days = pd.date_range('2023-12-31', '2024-01-09')
+    expected = [((activities.groupby('CONTAINER_ID')['DATE'].min() <= day) &
+                 (activities.groupby('CONTAINER_ID')['DATE'].max() >= day)).sum() for day in days]
+    np.testing.assert_array_equal(counts.at(np.ones(days.size, int), np.ones(days.size, int), days), expected)
@@ -0,0 +1,94 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from glas_o_mat.dataset import Dataset, ACTIVITIES_FILE, CONTAINERS_FILE, DISTANCE_MATRIX_FILE
+from glas_o_mat.partitions import disposition_area_ids
+from glas_o_mat.synthetic import write_fleet
+
+
+def test_partitions_are_rebuilt_when_activities_change(tmp_path):
+    path = str(tmp_path)
+    fleet = write_fleet(path, scale=0.05)
+    activities = fleet[ACTIVITIES_FILE]
+    area = int(disposition_area_ids(activities['CONTAINER_ID'])[0])
+    in_area = disposition_area_ids(activities['CONTAINER_ID']) == area
+
+    first = Dataset(path, areas=[area]).activities
+    assert first['CONTAINER_ID'].isin(activities.loc[in_area, 'CONTAINER_ID']).all()
+
+    # Drop the last day of the area from the CSV
+    last_day = activities.loc[in_area, 'RECORDED_AT'].max()[:10]
+    dropped = in_area & activities['RECORDED_AT'].str.startswith(last_day)
+    activities[~dropped].to_csv(os.path.join(path, ACTIVITIES_FILE), index=False)
+
+    second = Dataset(path, areas=[area]).activities
+    assert second['RECORDED_AT'].max() < pd.Timestamp(last_day)
+    assert first['RECORDED_AT'].max() >= pd.Timestamp(last_day)
+
+
+def test_distance_matrix_is_rebuilt_when_csv_changes(tmp_path):
+    path = str(tmp_path)
+    distances = pd.DataFrame({'START_LOCATION_ID': [1, 1], 'END_LOCATION_ID': [2, 3],
+                              'LENGTH': [100.0, 200.0], 'DURATION': [10.0, 20.0]})
+    distances.to_csv(os.path.join(path, DISTANCE_MATRIX_FILE), index=False)
+    assert Dataset(path).distances.distance(1, 2) == 100
+
+    distances.assign(LENGTH=[150.0, 250.0]).to_csv(os.path.join(path, DISTANCE_MATRIX_FILE), index=False)
+    assert Dataset(path).distances.distance(1, 2) == 150
+
+
+def test_streamed_activities_equal_activities(tmp_path):
+    path = str(tmp_path)
+    write_fleet(path, scale=0.05)
+    dataset = Dataset(path)
+
+    streamed = list(dataset.iter_activities(chunksize=300))
+
+    assert len(streamed) > 1
+    pd.testing.assert_frame_equal(pd.concat(streamed, ignore_index=True), dataset.activities)
+
+
+def test_filtered_activities_equal_unfiltered_activities_of_the_window(tmp_path):
+    path = str(tmp_path)
+    write_fleet(path, scale=0.05)
+    activities = Dataset(path, typed=True).activities
+    since = activities['RECORDED_AT'].min().normalize() + pd.Timedelta(days=60)
+    until = since + pd.Timedelta(days=29)
+
+    filtered = Dataset(path, typed=True, since=since, until=until).activities
+
+    window = (activities['RECORDED_AT'] >= since) & (activities['RECORDED_AT'] < until + pd.Timedelta(days=1))
+    pd.testing.assert_frame_equal(filtered, activities[window].reset_index(drop=True))
+
+
+@pytest.mark.parametrize('typed', [False, True])
+def test_ingest_equals_reload(tmp_path, typed):
+    fleet = write_fleet(str(tmp_path / 'full'), scale=0.05)
+    merged = pd.read_csv(tmp_path / 'full' / ACTIVITIES_FILE)
+    cut = len(merged) * 3 // 4
+
+    # The dataset is loaded from the activities before the cut
+    path = str(tmp_path / 'ingested')
+    write_fleet(path, scale=0.05)
+    merged.iloc[:cut].to_csv(os.path.join(path, ACTIVITIES_FILE), index=False)
+    dataset = Dataset(path, typed=typed)
+    dataset.predictor
+
+    # The rows after the cut arrive together with updates of earlier transactions
+    updated = merged.iloc[:cut].sample(20, random_state=0).copy()
+    updated['SLIDER_LEVEL'] = (updated['SLIDER_LEVEL'] + 30) % 100
+    updated['IS_EMPTIED'] = 1 - updated['IS_EMPTIED']
+    merged.loc[updated.index, ['SLIDER_LEVEL', 'IS_EMPTIED']] = updated[['SLIDER_LEVEL', 'IS_EMPTIED']]
+    merged.to_csv(os.path.join(tmp_path / 'full', ACTIVITIES_FILE), index=False)
+    dataset.ingest(pd.concat([merged.iloc[cut:], updated]))
+
+    reloaded = Dataset(str(tmp_path / 'full'), typed=typed)
+    pd.testing.assert_frame_equal(dataset.activities, reloaded.activities)
+    pd.testing.assert_frame_equal(dataset.aggregated, reloaded.aggregated)
+    container_ids = fleet[CONTAINERS_FILE]['CONTAINER_ID']
+    day = reloaded.activities['RECORDED_AT'].max() + pd.Timedelta(days=7)
+    np.testing.assert_array_equal(dataset.predict_levels(container_ids, day),
+                                  reloaded.predict_levels(container_ids, day))
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from glas_o_mat.fill_rate import FillRates
+
+
+def history(rows) -> pd.DataFrame:
+    return pd.DataFrame(rows, columns=['CONTAINER_ID', 'RECORDED_AT', 'IS_EMPTIED', 'LEVEL']) \
+        .assign(RECORDED_AT=lambda frame: pd.to_datetime(frame['RECORDED_AT']))
+
+
+def test_segments_run_from_emptying_to_next_reading():
+    fill_rates = FillRates.from_frame(history([
+        (1, '2024-01-01', 0, 0.2),
+        (1, '2024-01-03', 0, 0.6),
+        (1, '2024-01-05', 1, 1.0),  # reading before the container was emptied
+        (1, '2024-01-06', 0, 0.3),
+        (1, '2024-01-08', 0, 0.9),
+        (2, '2024-01-01', 1, 0.8),
+        (2, '2024-01-03', 0, 0.4),
+    ]))
+
+    segments = fill_rates.to_frame()
+    assert segments['START_LEVEL'].tolist() == [0.2, 0, 0]
+    assert segments['END_LEVEL'].tolist() == [1.0, 0.9, 0.4]
+    np.testing.assert_allclose(segments['FILL_RATE'], [0.2, 0.3, 0.2])
+    assert (fill_rates.mean_rates() > 0).all()
+    np.testing.assert_allclose(fill_rates.mean_rates([1]), [1.7 / 7])
+
+
+def test_emptying_as_last_activity_starts_segment_at_zero():
+    fill_rates = FillRates.from_frame(history([
+        (1, '2024-01-01', 0, 0.2),
+        (1, '2024-01-04', 1, 0.8),
+    ]))
+
+    last = fill_rates.last_segments([1])[0]
+    assert fill_rates.start_levels[last] == 0
+    assert fill_rates.end_levels[last] == 0
+    np.testing.assert_allclose(fill_rates.mean_rates(), [0.2])
+
+
+def test_empty_frame():
+    fill_rates = FillRates.from_frame(history([]))
+
+    assert len(fill_rates) == 0
+    assert fill_rates.mean_rates().size == 0
+    assert fill_rates.rows([]).size == 0
+    with pytest.raises(KeyError):
+        fill_rates.rows([1])
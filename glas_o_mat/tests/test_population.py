@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from glas_o_mat.population import METERS_PER_DEGREE, add_population_density, read_raster_window
+
+rasterio = pytest.importorskip('rasterio')
+
+# 1/120° cells, as the WorldPop 1 km rasters
+CELL = 1 / 120
+LEFT, TOP = 8.0, 48.0
+
+
+def write_raster(path, band, nodata=None):
+    profile = {'driver': 'GTiff', 'height': band.shape[0], 'width': band.shape[1], 'count': 1,
+               'dtype': band.dtype, 'crs': 'EPSG:4326', 'nodata': nodata,
+               'transform': rasterio.transform.from_origin(LEFT, TOP, CELL, CELL)}
+    with rasterio.open(path, 'w', **profile) as target:
+        target.write(band, 1)
+
+
+def brute_force_mean(band, lat, lon, radius_meters, nodata=None):
+    rows, cols = np.mgrid[0:band.shape[0], 0:band.shape[1]]
+    inside = ((TOP - (rows + 0.5) * CELL - lat) ** 2 + (LEFT + (cols + 0.5) * CELL - lon) ** 2
+              <= (radius_meters / METERS_PER_DEGREE) ** 2)
+    if nodata is not None:
+        inside &= band != nodata
+    return band[inside].mean() if inside.any() else np.nan
+
+
+def test_add_population_density(tmp_path):
+    band = np.random.default_rng(0).uniform(0, 1000, (60, 60)).astype(np.float32)
+    band[10:13, 10:13] = -99999
+    write_raster(tmp_path / 'density.tif', band, nodata=-99999)
+
+    activities = pd.DataFrame({
+        'LOCATION_ID': [1, 1, 2, 3, 4],
+        'NEW_LAT': [47.8, 47.8, 47.85, 47.9, np.nan],
+        'NEW_LON': [8.2, 8.2, 8.1, 8.09, 8.3],
+    })
+    densities = add_population_density(activities, str(tmp_path / 'density.tif'), radius_meters=2000)
+
+    expected = [brute_force_mean(band, lat, lon, 2000, nodata=-99999)
+                for lat, lon in zip(activities['NEW_LAT'][:4], activities['NEW_LON'][:4])]
+    np.testing.assert_allclose(densities['POPULATION_DENSITY'][:4], expected, rtol=1e-6)
+    assert np.isnan(densities['POPULATION_DENSITY'].iloc[4])
+
+
+def test_cells_outside_the_raster_are_not_zero(tmp_path):
+    band = np.full((10, 10), 500, dtype=np.int16)
+    write_raster(tmp_path / 'density.tif', band)
+
+    # A point on the corner of the raster, three quarters of its circle lie outside
+    lat, lon = np.array([TOP]), np.array([LEFT])
+    window, _ = read_raster_window(str(tmp_path / 'density.tif'), lat, lon, 0.05)
+    assert np.isnan(window).any()
+
+    activities = pd.DataFrame({'LOCATION_ID': [1], 'NEW_LAT': lat, 'NEW_LON': lon})
+    densities = add_population_density(activities, str(tmp_path / 'density.tif'), radius_meters=3000)
+    np.testing.assert_allclose(densities['POPULATION_DENSITY'], [500])
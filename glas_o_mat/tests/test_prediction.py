@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from glas_o_mat.prediction import LevelPredictor
+
+
+def aggregated(rows) -> pd.DataFrame:
+    frame = pd.DataFrame(rows, columns=['CONTAINER_ID', 'RECORDED_AT', 'IS_EMPTIED', 'LEVEL'])
+    return frame.assign(RECORDED_AT=pd.to_datetime(frame['RECORDED_AT']), VOLUME=3.0)
+
+
+ROWS = [
+    (1, '2024-01-01', 0, 0.0),
+    (1, '2024-01-11', 0, 1.0),
+    (2, '2024-01-01', 0, 0.0),
+    (2, '2024-01-11', 0, 3.0),
+    (3, '2024-01-11', 0, 0.2),
+]
+
+
+def test_container_emptied_by_last_activity_is_empty():
+    predictor = LevelPredictor(aggregated(ROWS + [(4, '2024-01-01', 0, 0.5), (4, '2024-01-11', 1, 2.5)]))
+
+    np.testing.assert_allclose(predictor.predict_levels([4], '2024-01-11'), [0])
+    np.testing.assert_allclose(predictor.predict_levels([4], '2024-01-12'), [0.2])
+
+
+def test_update_refreshes_predictions_using_the_median_rate():
+    predictor = LevelPredictor(aggregated(ROWS))
+    np.testing.assert_allclose(predictor.predict_levels([3], '2024-01-16'), [0.2 + 0.2 * 5])
+
+    predictor.update(aggregated(ROWS + [(1, '2024-01-21', 0, 5.0)]), [1])
+    np.testing.assert_allclose(predictor.predict_levels([3], '2024-01-16'), [0.2 + 0.275 * 5])
+
+
+def test_falling_levels_are_not_predicted_below_zero():
+    predictor = LevelPredictor(aggregated([(5, '2024-01-01', 0, 2.0), (5, '2024-01-11', 0, 1.0)]))
+
+    np.testing.assert_allclose(predictor.predict_levels([5], '2024-01-16'), [0.5])
+    np.testing.assert_allclose(predictor.predict_levels([5], '2024-03-01'), [0])
+
+
+def test_predictor_without_containers_predicts_nan():
+    predictor = LevelPredictor(aggregated([]))
+
+    assert np.isnan(predictor.predict_levels([1, 2], '2024-01-01')).all()
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+from glas_o_mat.spatial import CoordinateHistory, LocationIndex, haversine, nearest_locations
+
+VERSIONED = pd.DataFrame({
+    'LOCATION_ID': [1, 1, 2],
+    'START_DATUM': pd.to_datetime(['2024-03-01', '2024-04-01', '2024-01-01']),
+    'END_DATUM': pd.to_datetime(['2024-03-15', '2024-04-30', '2024-06-30']),
+    'LAT': [47.1, 47.2, 48.0],
+    'LONG': [8.1, 8.2, 9.0],
+})
+
+
+def test_coordinate_history_periods():
+    lat, lon = CoordinateHistory(VERSIONED).at([1, 1, 1, 2, 3], pd.to_datetime(
+        ['2024-03-01', '2024-03-20', '2024-05-10', '2024-02-01', '2024-03-01']))
+
+    np.testing.assert_array_equal(lat, [47.1, 47.1, 47.2, 48.0, np.nan])
+    np.testing.assert_array_equal(lon, [8.1, 8.1, 8.2, 9.0, np.nan])
+
+
+def test_coordinate_history_before_first_period():
+    lat, lon = CoordinateHistory(VERSIONED).at([1, 2], pd.to_datetime(['2024-02-01', '2023-12-31']))
+
+    assert np.isnan(lat).all() and np.isnan(lon).all()
+
+
+def test_coordinate_history_strict():
+    lat, _ = CoordinateHistory(VERSIONED).at([1, 1], pd.to_datetime(['2024-03-15', '2024-03-20']), strict=True)
+
+    np.testing.assert_array_equal(lat, [47.1, np.nan])
+
+
+def test_nearest_locations_with_missing_coordinates():
+    locations = pd.DataFrame({
+        'LOCATION_ID': [1, 2, 3, 4],
+        'GEO_LAT': [47.0, 47.001, np.nan, 47.01],
+        'GEO_LON': [8.0, 8.0, 8.0, 8.0],
+    })
+
+    nearest = nearest_locations(locations)
+
+    assert nearest['NEAREST_LOCATION_ID'].tolist()[:2] == [2, 1]
+    assert nearest['NEAREST_LOCATION_ID'].tolist()[3] == 2
+    assert np.isnan(nearest['NEAREST_LOCATION_ID'].iloc[2]) and np.isnan(nearest['DISTANCE_METERS'].iloc[2])
+    np.testing.assert_allclose(nearest['DISTANCE_METERS'].iloc[0], haversine(47.0, 8.0, 47.001, 8.0))
+
+
+def test_location_index_query_with_missing_coordinates():
+    index = LocationIndex([1, 2], [47.0, 47.1], [8.0, 8.0])
+
+    distances, location_ids = index.query([47.09, np.nan], [8.0, 8.0])
+
+    assert location_ids[0] == 2
+    assert np.isfinite(distances[0]) and np.isinf(distances[1])